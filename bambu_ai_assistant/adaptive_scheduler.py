@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class AdaptiveCaptureScheduler:
+    """Capture interval that follows screen activity within a CPU budget
+
+    Changed frames and chat activity shorten the interval, static screens
+    stretch it back out. The CPU budget is a percentage of one core used by
+    this process (as shown by top); when exceeded the interval is stretched
+    until usage fits again.
+    """
+
+    def __init__(self, base_interval=2.0, min_interval=0.25, max_interval=10.0,
+                 cpu_budget=50.0, activity_boost=10.0):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.cpu_budget = cpu_budget
+        self.activity_boost = activity_boost
+
+        self.interval = base_interval
+        self.current_interval = base_interval
+        self.active_until = 0.0
+        self.cpu_percent = 0.0
+        self.lock = threading.Lock()
+        self._last_wall = time.monotonic()
+        self._last_cpu = time.process_time()
+
+    def on_frame(self, changed):
+        """Speed up after a changed frame, back off after an unchanged one"""
+        with self.lock:
+            if changed:
+                self.interval = max(self.min_interval, self.interval / 2)
+            else:
+                self.interval = min(self.max_interval, self.interval * 1.25)
+
+    def on_user_activity(self):
+        """Capture at the fastest rate for a while after the user interacts"""
+        with self.lock:
+            self.active_until = time.monotonic() + self.activity_boost
+            self.interval = self.min_interval
+
+    def measure_cpu(self):
+        """Update and return this process's CPU use since the last call"""
+        now = time.monotonic()
+        cpu = time.process_time()
+        elapsed = now - self._last_wall
+        if elapsed >= 0.5:
+            self.cpu_percent = 100.0 * (cpu - self._last_cpu) / elapsed
+            self._last_wall = now
+            self._last_cpu = cpu
+        return self.cpu_percent
+
+    def next_interval(self):
+        """Return the delay before the next capture"""
+        cpu_percent = self.measure_cpu()
+        with self.lock:
+            interval = self.interval
+            if time.monotonic() < self.active_until:
+                interval = self.min_interval
+
+            # Work per frame is roughly constant, so CPU use scales with the rate
+            if self.cpu_budget and cpu_percent > self.cpu_budget:
+                interval = max(interval, interval * cpu_percent / self.cpu_budget)
+                self.interval = min(self.max_interval, interval)
+
+            self.current_interval = min(self.max_interval, interval)
+            return self.current_interval
+
+    @property
+    def rate(self):
+        """Current capture rate in frames per second"""
+        return 1.0 / max(self.current_interval, 1e-6)
@@ -1,16 +1,28 @@
-import cv2
 import numpy as np
 import json
 import time
 import logging
 
+from layout_profile import read_regions, parse_number
+from ocr_cache import tiled_image_to_data
+from frame import as_frame, upscale_rect
+from ui_tracker import UIElementTracker, same_element
+from profiling import profiler, in_range
+from blob_analysis import blob_stats
+from detector_scheduler import DetectorScheduler
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DETAILED_SECTIONS = ('model_preview', 'print_bed', 'ui_elements', 'actionable_items')
+
 class AdvancedBambuVision:
-    def __init__(self):
+    def __init__(self, layout_profile=None, tracking=True):
         self.model_cache = {}
+        self.layout_profile = layout_profile
+        self.tracker = UIElementTracker() if tracking else None
+        self.scheduler = self.build_scheduler()
         self.ocr_available = self._check_ocr_availability()
         
     def _check_ocr_availability(self):
@@ -28,64 +40,51 @@ class AdvancedBambuVision:
             logger.warning(f"OCR not available: {e}")
             return False
         
+    @profiler.timed("vision.detect_3d_model_preview")
     def detect_3d_model_preview(self, image):
         """Detect 3D model in the preview window using advanced CV"""
         try:
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = image
-            
-            # Use Canny edge detection
-            edges = cv2.Canny(gray, 50, 150, apertureSize=3)
-            
-            # Find contours that might represent 3D model edges
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            model_features = []
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 1000:  # Filter small noise
-                    # Get bounding rectangle
-                    rect = cv2.boundingRect(contour)
-                    
-                    # Calculate some features
-                    perimeter = cv2.arcLength(contour, True)
-                    circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0
-                    
-                    model_features.append({
-                        'area': area,
-                        'rect': rect,
-                        'circularity': circularity,
-                        'complexity': len(contour)
-                    })
+            # Outlines proposed on a coarse pyramid level, measured at full resolution
+            blobs = as_frame(image).proposed_edge_blobs
+            
+            # Filter small noise, then calculate some features
+            blobs = blobs[blobs.area > 1000]
+            circularity = blobs.circularity
             
-            return model_features
+            return [{
+                'area': float(blobs.area[i]),
+                'rect': blobs[i],
+                'circularity': float(circularity[i]),
+                'complexity': int(blobs.vertices[i])
+            } for i in range(len(blobs))]
             
         except Exception as e:
             logger.error(f"Error in 3D model detection: {e}")
+            profiler.count("errors.detect_3d_model_preview")
             return []
     
+    @profiler.timed("vision.analyze_print_bed")
     def analyze_print_bed(self, image):
         """Analyze the print bed area for objects and positioning"""
         try:
             if len(image.shape) != 3:
                 return {'bed_detected': False, 'error': 'Invalid image format'}
                 
-            # Convert to HSV for better color detection
-            hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+            # Convert to HSV for better color detection, on a coarse pyramid level
+            frame = as_frame(image)
+            level = frame.pyramid_level()
+            hsv = frame.level(level).hsv
             
             # Define range for print bed (usually black or gray)
             bed_lower = np.array([0, 0, 0])
             bed_upper = np.array([180, 255, 100])
-            bed_mask = cv2.inRange(hsv, bed_lower, bed_upper)
+            bed_mask = in_range(hsv, bed_lower, bed_upper)
             
             # Find the largest rectangular area (likely the bed)
-            contours, _ = cv2.findContours(bed_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            blobs = blob_stats(bed_mask)
             
-            if contours:
-                bed_contour = max(contours, key=cv2.contourArea)
-                bed_rect = cv2.boundingRect(bed_contour)
+            if len(blobs):
+                bed_rect = upscale_rect(blobs[blobs.largest()], level)
                 
                 return {
                     'bed_detected': True,
@@ -97,31 +96,71 @@ class AdvancedBambuVision:
             
         except Exception as e:
             logger.error(f"Error in print bed analysis: {e}")
+            profiler.count("errors.analyze_print_bed")
             return {'bed_detected': False, 'error': str(e)}
     
+    @profiler.timed("vision.detect_ui_elements")
     def detect_ui_elements(self, image):
         """Detect specific Bambu Studio UI elements"""
         try:
             ui_elements = {}
+            frame = as_frame(image)
             
             # Detect buttons (usually rounded rectangles with specific colors)
-            ui_elements['buttons'] = self.find_buttons(image)
+            ui_elements['buttons'] = self.detect_buttons(frame)
             
             # Detect progress bars
-            ui_elements['progress_bars'] = self.find_progress_indicators(image)
+            ui_elements['progress_bars'] = self.detect_progress_bars(frame)
             
             # Detect temperature displays (only if OCR is available)
-            if self.ocr_available:
-                ui_elements['temperature_displays'] = self.find_temperature_areas(image)
-            else:
-                ui_elements['temperature_displays'] = []
+            ui_elements['temperature_displays'] = self.detect_temperature_displays(frame)
             
             return ui_elements
             
         except Exception as e:
             logger.error(f"Error in UI element detection: {e}")
+            profiler.count("errors.detect_ui_elements")
             return {'buttons': [], 'progress_bars': [], 'temperature_displays': []}
     
+    def detect_buttons(self, frame):
+        return self.track('buttons', frame, self.find_buttons, same_element('color'))
+    
+    def detect_progress_bars(self, frame):
+        return self.track('progress_bars', frame, self.find_progress_indicators, same_element('type'))
+    
+    def detect_temperature_displays(self, frame):
+        """Temperature readouts, or [] without OCR"""
+        if not self.ocr_available:
+            return []
+        # Layout profile regions are fixed already, only OCR'd text needs tracking
+        if self.layout_profile is not None:
+            return self.find_temperature_areas(frame)
+        return self.track('temperature_displays', frame, self.find_temperature_areas, same_element())
+    
+    def build_scheduler(self):
+        """Register the detectors with what they read, so reports run only what they need"""
+        scheduler = DetectorScheduler()
+        scheduler.register('model_preview', lambda f, r: self.detect_3d_model_preview(f), inputs=('gray', 'edges'))
+        scheduler.register('print_bed', lambda f, r: self.analyze_print_bed(f), inputs=('hsv',))
+        scheduler.register('buttons', lambda f, r: self.detect_buttons(f), inputs=('hsv',))
+        scheduler.register('progress_bars', lambda f, r: self.detect_progress_bars(f), inputs=('gray', 'edges'))
+        scheduler.register('temperature_displays', lambda f, r: self.detect_temperature_displays(f), inputs=('ocr',))
+        scheduler.register('ui_elements', lambda f, r: {
+            'buttons': r['buttons'],
+            'progress_bars': r['progress_bars'],
+            'temperature_displays': r['temperature_displays'],
+        }, inputs=('buttons', 'progress_bars', 'temperature_displays'))
+        scheduler.register('actionable_items', lambda f, r: self.find_actionable_items(r['buttons'], r['progress_bars']),
+                           inputs=('buttons', 'progress_bars'))
+        return scheduler
+    
+    def track(self, kind, frame, detect, same):
+        """Run a detector through the tracker, or on the whole frame when tracking is off"""
+        if self.tracker is None:
+            return detect(frame)
+        return self.tracker.update(kind, frame, detect, same)
+    
+    @profiler.timed("vision.find_buttons")
     def find_buttons(self, image):
         """Find button-like UI elements"""
         try:
@@ -129,9 +168,12 @@ class AdvancedBambuVision:
             
             if len(image.shape) != 3:
                 return buttons
-                
-            # Convert to different color spaces for better detection
-            hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+            
+            # Search a coarse pyramid level, then refine each hit at full resolution
+            frame = as_frame(image)
+            level = frame.pyramid_level()
+            scale = 1 << level
+            hsv = frame.level(level).hsv
             
             # Common button colors in Bambu Studio
             button_colors = {
@@ -142,74 +184,91 @@ class AdvancedBambuVision:
             }
             
             for color_name, (lower, upper) in button_colors.items():
-                mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
-                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                mask = in_range(hsv, np.array(lower), np.array(upper))
+                blobs = blob_stats(mask).scaled(scale)
                 
-                for contour in contours:
-                    area = cv2.contourArea(contour)
-                    if 500 < area < 5000:  # Reasonable button size
-                        rect = cv2.boundingRect(contour)
-                        w, h = rect[2], rect[3]
+                # Reasonable button size; only these few candidates are refined
+                blobs = blobs[(blobs.area > 500) & (blobs.area < 5000)]
+                for i, area in enumerate(blobs.area):
+                    rect = blobs[i]
+                    if level > 0:
+                        rect, area = self.refine_color_rect(frame, rect, lower, upper, margin=scale * 2, fallback_area=area)
+                    w, h = rect[2], rect[3]
+                    
+                    if h > 0:  # Prevent division by zero
+                        aspect_ratio = w / h
                         
-                        if h > 0:  # Prevent division by zero
-                            aspect_ratio = w / h
-                            
-                            # Buttons usually have certain aspect ratios
-                            if 1.5 < aspect_ratio < 4:
-                                buttons.append({
-                                    'color': color_name,
-                                    'position': rect,
-                                    'center': (rect[0] + rect[2]//2, rect[1] + rect[3]//2),
-                                    'confidence': min(1.0, area / 2000)
-                                })
+                        # Buttons usually have certain aspect ratios
+                        if 1.5 < aspect_ratio < 4:
+                            buttons.append({
+                                'color': color_name,
+                                'position': rect,
+                                'center': (rect[0] + rect[2]//2, rect[1] + rect[3]//2),
+                                'confidence': min(1.0, float(area) / 2000)
+                            })
             
             return buttons
             
         except Exception as e:
             logger.error(f"Error in button detection: {e}")
+            profiler.count("errors.find_buttons")
             return []
     
+    def refine_color_rect(self, frame, rect, lower, upper, margin=4, fallback_area=0):
+        """Re-detect a colored blob at full resolution inside a small crop around rect"""
+        x, y, w, h = rect
+        x1, y1 = max(0, x - margin), max(0, y - margin)
+        x2, y2 = min(frame.width, x + w + margin), min(frame.height, y + h + margin)
+        
+        crop = frame.crop(x1, y1, x2 - x1, y2 - y1)
+        mask = in_range(crop.hsv, np.array(lower), np.array(upper))
+        blobs = blob_stats(mask)
+        if not len(blobs):
+            return rect, fallback_area
+        
+        i = blobs.largest()
+        cx, cy, cw, ch = blobs[i]
+        return (x1 + cx, y1 + cy, cw, ch), float(blobs.area[i])
+    
+    @profiler.timed("vision.find_progress_indicators")
     def find_progress_indicators(self, image):
         """Find progress bars and percentage indicators"""
         try:
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = image
+            # Candidates come from a coarse pyramid level, outlines and fill are
+            # measured at full resolution
+            frame = as_frame(image)
             
             # Look for rectangular shapes that could be progress bars
-            edges = cv2.Canny(gray, 50, 150)
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            blobs = frame.proposed_edge_blobs
+            
+            # Progress bars are typically wide and short, and inside the frame
+            w, h = blobs.width, blobs.height
+            blobs = blobs[(w > 100) & (h > 10) & (w > h * 3) &
+                          (blobs.x + w <= frame.width) & (blobs.y + h <= frame.height)]
             
             progress_indicators = []
             
-            for contour in contours:
-                rect = cv2.boundingRect(contour)
-                w, h = rect[2], rect[3]
+            for i in range(len(blobs)):
+                rect = blobs[i]
+                x1, y1, w, h = rect
                 
-                # Progress bars are typically wide and short
-                if w > 100 and h > 10 and w > h * 3:
-                    # Analyze the fill pattern
-                    y1, y2 = rect[1], rect[1] + h
-                    x1, x2 = rect[0], rect[0] + w
-                    
-                    # Check bounds
-                    if y2 <= gray.shape[0] and x2 <= gray.shape[1]:
-                        roi = gray[y1:y2, x1:x2]
-                        
-                        if roi.size > 0:
-                            # Simple progress estimation
-                            estimated_progress = self.estimate_progress_fill(roi)
-                            progress_indicators.append({
-                                'position': rect,
-                                'estimated_progress': estimated_progress,
-                                'type': 'horizontal_bar'
-                            })
+                # Analyze the fill pattern
+                roi = frame.crop(x1, y1, w, h).gray
+                
+                if roi.size > 0:
+                    # Simple progress estimation
+                    estimated_progress = self.estimate_progress_fill(roi)
+                    progress_indicators.append({
+                        'position': rect,
+                        'estimated_progress': estimated_progress,
+                        'type': 'horizontal_bar'
+                    })
             
             return progress_indicators
             
         except Exception as e:
             logger.error(f"Error in progress indicator detection: {e}")
+            profiler.count("errors.find_progress_indicators")
             return []
     
     def estimate_progress_fill(self, roi):
@@ -249,24 +308,24 @@ class AdvancedBambuVision:
             
         except Exception as e:
             logger.error(f"Error estimating progress: {e}")
+            profiler.count("errors.estimate_progress_fill")
             return 0
     
+    @profiler.timed("vision.find_temperature_areas")
     def find_temperature_areas(self, image):
         """Find areas likely to contain temperature information"""
         if not self.ocr_available:
             logger.warning("OCR not available for temperature detection")
             return []
             
-        try:
-            import pytesseract
+        if self.layout_profile is not None:
+            return self.find_temperature_regions(image)
             
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = image
+        try:
+            gray = as_frame(image).gray
             
-            # Get detailed OCR data with bounding boxes
-            data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+            # Get detailed OCR data with bounding boxes, unchanged bands come from the cache
+            data = tiled_image_to_data(gray)
             
             temperature_areas = []
             
@@ -302,67 +361,107 @@ class AdvancedBambuVision:
             
         except Exception as e:
             logger.error(f"OCR error in temperature detection: {e}")
+            profiler.count("errors.find_temperature_areas")
             return []
     
-    def generate_detailed_report(self, image):
-        """Generate a comprehensive analysis report"""
+    def find_temperature_regions(self, image):
+        """Read temperatures from the layout profile regions only"""
+        temperature_areas = []
+        
+        try:
+            regions = read_regions(as_frame(image).gray, self.layout_profile, kind='temperature')
+            for name, region in regions.items():
+                temp_value = parse_number(region['text'])
+                if temp_value is None or not 0 <= temp_value <= 350:
+                    continue
+                x, y, w, h = region['box']
+                temperature_areas.append({
+                    'text': region['text'],
+                    'value': temp_value,
+                    'position': (x, y, w, h),
+                    'center': (x + w//2, y + h//2),
+                    'region': name
+                })
+        except Exception as e:
+            logger.error(f"OCR error in temperature regions: {e}")
+            profiler.count("errors.find_temperature_regions")
+        
+        return temperature_areas
+    
+    @profiler.timed("vision.generate_detailed_report")
+    def generate_detailed_report(self, image, sections=None):
+        """Generate a comprehensive analysis report
+        
+        sections limits the report to some of DETAILED_SECTIONS (or any
+        detector output, e.g. 'buttons'); only the detectors they need run.
+        """
         try:
             if image is None or image.size == 0:
                 return {'error': 'Invalid image provided'}
+            
+            # Share color conversions between all detectors
+            image = as_frame(image)
                 
             report = {
                 'timestamp': time.time(),
                 'image_dimensions': image.shape[:2] if len(image.shape) >= 2 else (0, 0),
-                'model_preview': self.detect_3d_model_preview(image),
-                'print_bed': self.analyze_print_bed(image),
-                'ui_elements': self.detect_ui_elements(image),
-                'actionable_items': []
             }
-            
-            # Generate actionable recommendations
-            if report['ui_elements']['buttons']:
-                for button in report['ui_elements']['buttons']:
-                    if button['color'] == 'orange' and button['confidence'] > 0.7:
-                        report['actionable_items'].append({
-                            'action': 'slice_model',
-                            'description': 'Slice button detected and ready to click',
-                            'position': button['center'],
-                            'confidence': button['confidence']
-                        })
-                    elif button['color'] == 'blue' and button['confidence'] > 0.7:
-                        report['actionable_items'].append({
-                            'action': 'start_print',
-                            'description': 'Print button detected and ready to click',
-                            'position': button['center'],
-                            'confidence': button['confidence']
-                        })
-            
-            if report['ui_elements']['progress_bars']:
-                for pb in report['ui_elements']['progress_bars']:
-                    if pb['estimated_progress'] > 0:
-                        report['actionable_items'].append({
-                            'action': 'monitor_progress',
-                            'description': f'Print progress: {pb["estimated_progress"]}%',
-                            'progress': pb['estimated_progress']
-                        })
-            
+            results = self.scheduler.run(image, sections or DETAILED_SECTIONS)
+            report.update((name, results[name]) for name in sections or DETAILED_SECTIONS)
             return report
             
         except Exception as e:
             logger.error(f"Error generating detailed report: {e}")
+            profiler.count("errors.generate_detailed_report")
             return {'error': str(e), 'timestamp': time.time()}
+    
+    def find_actionable_items(self, buttons, progress_bars):
+        """Generate actionable recommendations"""
+        actionable_items = []
+        for button in buttons:
+            if button['color'] == 'orange' and button['confidence'] > 0.7:
+                actionable_items.append({
+                    'action': 'slice_model',
+                    'description': 'Slice button detected and ready to click',
+                    'position': button['center'],
+                    'confidence': button['confidence']
+                })
+            elif button['color'] == 'blue' and button['confidence'] > 0.7:
+                actionable_items.append({
+                    'action': 'start_print',
+                    'description': 'Print button detected and ready to click',
+                    'position': button['center'],
+                    'confidence': button['confidence']
+                })
+        
+        for pb in progress_bars:
+            if pb['estimated_progress'] > 0:
+                actionable_items.append({
+                    'action': 'monitor_progress',
+                    'description': f'Print progress: {pb["estimated_progress"]}%',
+                    'progress': pb['estimated_progress']
+                })
+        
+        return actionable_items
 
 # Usage functions for integration
-def get_advanced_analysis(screenshot_array):
+_vision_instances = {}
+
+def get_advanced_analysis(screenshot_array, layout_profile=None):
     """Main function to get advanced vision analysis"""
     try:
         if screenshot_array is None:
             return {'error': 'No screenshot provided'}
             
-        vision = AdvancedBambuVision()
+        # Reuse one instance per profile so tracked UI elements carry over between calls
+        key = layout_profile.name if layout_profile is not None else None
+        vision = _vision_instances.get(key)
+        if vision is None:
+            vision = _vision_instances[key] = AdvancedBambuVision(layout_profile=layout_profile)
         return vision.generate_detailed_report(screenshot_array)
     except Exception as e:
         logger.error(f"Error in get_advanced_analysis: {e}")
+        profiler.count("errors.get_advanced_analysis")
         return {'error': str(e)}
 
 
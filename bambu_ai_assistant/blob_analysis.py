@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+
+from profiling import profiler, find_contours
+
+
+class Blobs:
+    """Statistics of every external contour of a mask, as parallel NumPy arrays
+
+    Detectors filter with boolean masks (`blobs[blobs.area > 500]`) instead
+    of looping over contours. Index with an array or mask to get a subset and
+    with an int to get the (x, y, w, h) rect of one blob.
+    """
+
+    def __init__(self, area, rects, centroids, perimeter, vertices):
+        self.area = area
+        self.rects = rects
+        self.centroids = centroids
+        self.perimeter = perimeter
+        self.vertices = vertices
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0), np.zeros((0, 4), dtype=np.int64), np.zeros((0, 2)), np.zeros(0),
+                   np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.area)
+
+    def __getitem__(self, index):
+        if np.isscalar(index):
+            return tuple(int(v) for v in self.rects[index])
+        return Blobs(self.area[index], self.rects[index], self.centroids[index], self.perimeter[index],
+                     self.vertices[index])
+
+    @property
+    def x(self):
+        return self.rects[:, 0]
+
+    @property
+    def y(self):
+        return self.rects[:, 1]
+
+    @property
+    def width(self):
+        return self.rects[:, 2]
+
+    @property
+    def height(self):
+        return self.rects[:, 3]
+
+    @property
+    def aspect(self):
+        """Width over height (0 for zero-height blobs)"""
+        return np.divide(self.width, self.height, out=np.zeros(len(self)), where=self.height > 0)
+
+    @property
+    def centers(self):
+        """Rect centers, in the (x + w//2, y + h//2) form the detectors report"""
+        return self.rects[:, :2] + self.rects[:, 2:] // 2
+
+    @property
+    def circularity(self):
+        return np.divide(4 * np.pi * self.area, self.perimeter ** 2, out=np.zeros(len(self)),
+                         where=self.perimeter > 0)
+
+    def largest(self):
+        """Index of the biggest blob, or None"""
+        return int(np.argmax(self.area)) if len(self) else None
+
+    def scaled(self, scale):
+        """Map stats found on a pyramid level back to full resolution"""
+        if scale == 1:
+            return self
+        return Blobs(self.area * scale * scale, self.rects * scale, self.centroids * scale,
+                     self.perimeter * scale, self.vertices)
+
+
+@profiler.timed("blobs")
+def blob_stats(mask):
+    """Area, bounding rect, centroid and perimeter of every external contour of a mask
+
+    Gives the same values as cv2.contourArea, cv2.boundingRect and
+    cv2.arcLength(closed=True) per contour, but computed for all contours at
+    once from their concatenated points.
+    """
+    contours, _ = find_contours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return Blobs.empty()
+
+    vertices = np.fromiter(map(len, contours), dtype=np.int64, count=len(contours))
+    corners = np.concatenate(contours).reshape(-1, 2)
+    starts = np.zeros(len(vertices), dtype=np.int64)
+    np.cumsum(vertices[:-1], out=starts[1:])
+
+    low = np.minimum.reduceat(corners, starts)
+    high = np.maximum.reduceat(corners, starts)
+    rects = np.hstack([low, high - low + 1]).astype(np.int64)
+
+    # Each point's successor, wrapping around to close its contour
+    points = corners.astype(np.float64)
+    successors = np.empty_like(points)
+    successors[:-1] = points[1:]
+    successors[starts + vertices - 1] = points[starts]
+
+    # Shoelace formula for area and centroid
+    cross = points[:, 0] * successors[:, 1] - successors[:, 0] * points[:, 1]
+    signed_area = np.add.reduceat(cross, starts) / 2
+    moments = np.add.reduceat((points + successors) * cross[:, None], starts)
+    mean = np.add.reduceat(points, starts) / vertices[:, None]
+    degenerate = signed_area == 0
+    centroids = np.where(degenerate[:, None], mean,
+                         moments / (6 * np.where(degenerate, 1, signed_area))[:, None])
+
+    steps = (successors - points).astype(np.float32)
+    perimeter = np.add.reduceat(np.hypot(steps[:, 0], steps[:, 1]), starts, dtype=np.float64)
+
+    return Blobs(np.abs(signed_area), rects, centroids, perimeter, vertices)
@@ -1,38 +1,185 @@
 import os
 import json
+import random
+import socket
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+
+from profiling import profiler
+
+# Seconds to wait for a connection, and for each chunk of the streamed reply
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 60.0
+
+# Responses worth retrying (rate limited or a server hiccup); others fail at once
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Keep-alive connections kept open to the API host
+POOL_SIZE = 4
+
+
+def parse_stream(lines):
+    """Yield the content deltas of a chat completion stream, given its SSE lines."""
+    for line in lines:
+        if not line:
+            continue
+        if line.startswith(b"data:"):
+            line = line[len(b"data:"):].strip()
+        if line == b"[DONE]":
+            break
+        data = json.loads(line.decode("utf-8"))
+        delta = data.get("choices", [{}])[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+
+def abort_response(resp):
+    """Close a streaming response, waking a read blocked on its socket at once."""
+    # Closing alone waits for the blocked read to time out; a shutdown ends it
+    sock = getattr(getattr(resp.raw, "connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    resp.close()
+
 
 class ChatAPIClient:
-    """Simple wrapper for OpenAI's chat completion API with streaming."""
+    """Simple wrapper for OpenAI's chat completion API with streaming.
 
-    def __init__(self, api_key=None, model=None):
+    One pooled keep-alive session is reused for every message, so only the
+    first pays for the TCP and TLS handshake. Connection errors and 429/5xx
+    responses are retried with jittered exponential backoff until the reply
+    starts streaming. Point `endpoint` (or OPENAI_API_URL) at a local server
+    to test without the real API. With a Conversation, questions are sent
+    with the history and screen changes it keeps, and answers are added to it.
+    """
+
+    def __init__(self, api_key=None, model=None, endpoint=None, timeout=None,
+                 max_retries=MAX_RETRIES, session=None, conversation=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
         self.model = model or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
-        self.endpoint = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+        self.endpoint = endpoint or os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+        self.timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.max_retries = max_retries
+        self.session = session or self.make_session()
+        self.conversation = conversation
+        self.last_ttft = None
+        self.streams = set()
+        self.streams_lock = threading.Lock()
 
-    def send(self, user_message):
-        """Send a user message and yield the streamed response chunks."""
-        headers = {
+    def make_session(self):
+        """Keep-alive session with a small connection pool and our auth headers."""
+        session = requests.Session()
+        # Retries are ours (below); the adapter must not resend on its own
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
-        }
+        })
+        return session
+
+    def close(self):
+        self.cancel()
+        self.session.close()
+
+    def cancel(self):
+        """Abort every reply being streamed, even one stalled waiting for data."""
+        with self.streams_lock:
+            streams, self.streams = self.streams, set()
+        for resp in streams:
+            abort_response(resp)
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retrying, honouring a Retry-After header."""
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), BACKOFF_MAX)
+            except ValueError:
+                pass  # An HTTP date; fall back to our own backoff
+        # Full jitter keeps clients that failed together from retrying together
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def open_stream(self, payload):
+        """POST a request and return the streaming response, retrying failures."""
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                resp = self.session.post(self.endpoint, json=payload, stream=True, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if resp.status_code not in RETRY_STATUSES or last_attempt:
+                    if not resp.ok:
+                        resp.close()
+                        resp.raise_for_status()
+                    return resp
+                delay = self.backoff(attempt, resp.headers.get("Retry-After"))
+                resp.content  # Drain the short error body so the connection is reused
+                resp.close()
+            profiler.count("chat.retries")
+            time.sleep(delay)
+
+    def build_messages(self, user_message, screen=None):
+        """Chat messages for a question, with the screen analysis lines as context."""
+        if self.conversation is not None:
+            return self.conversation.messages(user_message, screen)
+        messages = []
+        if screen:
+            messages.append({"role": "system",
+                             "content": "Current Bambu Studio screen analysis:\n" + "\n".join(screen)})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def send(self, user_message, screen=None, cancel=None):
+        """Send a user message and yield the streamed response chunks.
+
+        Setting the `cancel` event stops the stream (and drops its connection)
+        at the next chunk; cancel() after setting it also ends a stalled one.
+        """
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": user_message}],
+            "messages": self.build_messages(user_message, screen),
             "stream": True,
         }
-        with requests.post(self.endpoint, headers=headers, json=payload, stream=True) as resp:
-            resp.raise_for_status()
-            for line in resp.iter_lines():
-                if not line:
-                    continue
-                if line.startswith(b"data:"):
-                    line = line[len(b"data:"):].strip()
-                if line == b"[DONE]":
-                    break
-                data = json.loads(line.decode("utf-8"))
-                delta = data.get("choices", [{}])[0].get("delta", {}).get("content")
-                if delta:
+        start = time.perf_counter()
+        self.last_ttft = None
+        chunks = []
+        # Once tokens flow a failure is final: the reply cannot be resumed
+        with self.open_stream(payload) as resp:
+            with self.streams_lock:
+                self.streams.add(resp)
+            try:
+                for delta in parse_stream(resp.iter_lines()):
+                    if cancel is not None and cancel.is_set():
+                        return
+                    if self.last_ttft is None:
+                        self.last_ttft = time.perf_counter() - start
+                        profiler.record("chat.ttft", self.last_ttft)
+                    chunks.append(delta)
                     yield delta
+            except Exception:
+                # An aborted stream fails its read; that is the cancel, not an error
+                if cancel is not None and cancel.is_set():
+                    return
+                raise
+            finally:
+                with self.streams_lock:
+                    self.streams.discard(resp)
+            if cancel is not None and cancel.is_set():
+                return
+        profiler.record("chat.total", time.perf_counter() - start)
+        if self.conversation is not None and chunks:
+            self.conversation.add_turn(user_message, screen, "".join(chunks))
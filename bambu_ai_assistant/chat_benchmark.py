@@ -0,0 +1,238 @@
+"""Offline latency benchmark for the chat client
+
+Starts the mock chat server in-process and measures time to first token,
+tokens per second, the cost of parsing the stream, and how the client copes
+with concurrent sessions, failing requests and stalled streams. It also
+checks which questions the response cache answers without a request, and
+exits with 1 when one of those checks fails:
+
+    python chat_benchmark.py
+    python chat_benchmark.py --scenarios paced,errors --sessions 1,4,8 --output chat.json
+"""
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+from chat_api_client import ChatAPIClient, parse_stream
+from conversation import Conversation
+from mock_chat_server import MockChatConfig, MockChatServer, REPLY_WORDS
+from response_cache import CachedChatClient, ResponseCache
+from profiling import profiler
+
+PROMPT = "Is the nozzle heating?"
+
+# Mock server behaviour and client timeouts of each scenario
+SCENARIOS = {
+    # No delays: the client's own ceiling
+    'unthrottled': {'config': {'rate': 0, 'first_token': 0.0, 'jitter': 0.0}},
+    # A realistic answer: 200 ms to the first token, then 50 tokens a second
+    'paced': {'config': {'rate': 50, 'first_token': 0.2, 'jitter': 0.2}},
+    # A third of the requests fail with 429/500/503 and are retried
+    'errors': {'config': {'rate': 0, 'first_token': 0.0, 'error_rate': 0.3}},
+    # A third of the answers stall for longer than the read timeout
+    'stalls': {'config': {'rate': 0, 'first_token': 0.0, 'stall_rate': 0.3, 'stall_seconds': 1.0},
+               'timeout': (2.0, 0.5)},
+}
+
+
+def measure_request(client):
+    """Stream one answer; returns its timings in ms and token count"""
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    for _ in client.send(PROMPT):
+        if first is None:
+            first = time.perf_counter() - start
+        tokens += 1
+    total = time.perf_counter() - start
+    return {'ttft_ms': first * 1000 if first is not None else None, 'total_ms': total * 1000, 'tokens': tokens}
+
+
+def run_sessions(url, sessions, requests_per_session, timeout=None):
+    """Run concurrent sessions, each with its own client; returns (samples, errors, seconds)"""
+    samples = []
+    errors = []
+    lock = threading.Lock()
+
+    def session():
+        client = ChatAPIClient(api_key="mock", endpoint=url, timeout=timeout)
+        try:
+            for _ in range(requests_per_session):
+                try:
+                    sample = measure_request(client)
+                except requests.RequestException as e:
+                    with lock:
+                        errors.append(type(e).__name__)
+                    continue
+                with lock:
+                    samples.append(sample)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - start
+
+
+def cache_checks(server):
+    """Count the requests the response cache lets through for repeated questions
+
+    Returns {check name: {'output', 'expected', 'ok'}}, in requests made.
+    """
+    checks = {}
+    cache = ResponseCache()
+    screen = ["🌡️ Nozzle: 220"]
+
+    def ask(conversation, question):
+        client = ChatAPIClient(api_key="mock", endpoint=server.url, conversation=conversation)
+        before = server.counts.get("requests", 0)
+        try:
+            for _ in CachedChatClient(client, cache).send(question, screen=screen):
+                pass
+        finally:
+            client.close()
+        return server.counts.get("requests", 0) - before
+
+    def check(name, output, expected):
+        checks[name] = {'output': output, 'expected': expected, 'ok': output == expected}
+
+    check('cache.first_question', ask(Conversation(), "Why?"), 1)
+    check('cache.repeat_question', ask(Conversation(), "why"), 0)
+    # The same words after an earlier turn ask something else
+    follow_up = Conversation()
+    ask(follow_up, PROMPT)
+    check('cache.follow_up', ask(follow_up, "Why?"), 1)
+    return checks
+
+
+def summarize(samples, errors, elapsed):
+    ttft = np.array([s['ttft_ms'] for s in samples if s['ttft_ms'] is not None])
+    tokens = sum(s['tokens'] for s in samples)
+    # Streaming rate of one answer, after its first token
+    rates = [(s['tokens'] - 1) / ((s['total_ms'] - s['ttft_ms']) / 1000) for s in samples
+             if s['ttft_ms'] is not None and s['tokens'] > 1 and s['total_ms'] > s['ttft_ms']]
+    summary = {
+        'requests': len(samples) + len(errors),
+        'errors': len(errors),
+        'tokens_per_s': round(float(np.median(rates)), 1) if rates else None,
+        'total_tokens_per_s': round(tokens / elapsed, 1) if elapsed > 0 else None,
+    }
+    if len(ttft):
+        summary.update(ttft_p50_ms=round(float(np.percentile(ttft, 50)), 2),
+                       ttft_p95_ms=round(float(np.percentile(ttft, 95)), 2))
+    if errors:
+        summary['error_types'] = sorted(set(errors))
+    return summary
+
+
+def sse_body(tokens):
+    """The SSE bytes of an answer, as the mock server streams it"""
+    lines = []
+    for i in range(tokens):
+        word = REPLY_WORDS[i % len(REPLY_WORDS)]
+        chunk = {"id": "mock", "object": "chat.completion.chunk", "model": "mock",
+                 "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+        lines.append(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+    lines.append(b"data: [DONE]\n\n")
+    return b"".join(lines)
+
+
+def parser_overhead(tokens=2000, repeat=5):
+    """Microseconds per token spent in iter_lines and parse_stream, without a network"""
+    body = sse_body(tokens)
+    timings = []
+    for _ in range(repeat):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.raw = io.BytesIO(body)
+        start = time.perf_counter()
+        count = sum(1 for _ in parse_stream(resp.iter_lines()))
+        timings.append((time.perf_counter() - start) / count * 1e6)
+    return {'tokens': tokens, 'us_per_token': round(float(np.median(timings)), 2)}
+
+
+def run(scenarios, sessions=(1, 4), requests_per_session=5, tokens=60, seed=0):
+    """Benchmark the client against the mock server; returns {'parser', 'scenarios', 'cache'}"""
+    results = {'parser': parser_overhead(), 'scenarios': {}}
+    server = MockChatServer(config=MockChatConfig(tokens=tokens, seed=seed)).start()
+    try:
+        for name in scenarios:
+            scenario = SCENARIOS[name]
+            server.config = MockChatConfig(tokens=tokens, seed=seed, **scenario['config'])
+            results['scenarios'][name] = {}
+            for count in sessions:
+                profiler.reset()
+                samples, errors, elapsed = run_sessions(server.url, count, requests_per_session,
+                                                        timeout=scenario.get('timeout'))
+                summary = summarize(samples, errors, elapsed)
+                summary['retries'] = profiler.snapshot()['counters'].get("chat.retries", 0)
+                results['scenarios'][name][count] = summary
+        server.config = MockChatConfig(tokens=tokens, seed=seed, **SCENARIOS['unthrottled']['config'])
+        results['cache'] = cache_checks(server)
+    finally:
+        server.stop()
+    return results
+
+
+def cell(value, width):
+    return f"{value:>{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+
+def print_results(results):
+    parser = results['parser']
+    print(f"Stream parsing: {parser['us_per_token']:.2f} µs per token ({parser['tokens']} tokens)")
+    print(f"{'scenario':<12} {'sessions':>8} {'requests':>8} {'errors':>6} {'retries':>7} "
+          f"{'ttft p50':>9} {'ttft p95':>9} {'tok/s':>8} {'total tok/s':>11}")
+    for name, by_sessions in results['scenarios'].items():
+        for count, s in by_sessions.items():
+            print(f"{name:<12} {count:>8} {s['requests']:>8} {s['errors']:>6} {s['retries']:>7} "
+                  f"{cell(s.get('ttft_p50_ms'), 9)} {cell(s.get('ttft_p95_ms'), 9)} "
+                  f"{cell(s['tokens_per_s'], 8)} {cell(s['total_tokens_per_s'], 11)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat client against a local mock server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Comma-separated list of " + ", ".join(SCENARIOS))
+    parser.add_argument("--sessions", default="1,4", help="Comma-separated concurrent session counts")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per session")
+    parser.add_argument("--tokens", type=int, default=60, help="Tokens per answer")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the mock server's randomness")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    try:
+        sessions = [int(s) for s in args.sessions.split(",") if s.strip()]
+    except ValueError:
+        parser.error("--sessions must be a comma-separated list of numbers")
+
+    results = run(scenarios, sessions=sessions, requests_per_session=args.requests,
+                  tokens=args.tokens, seed=args.seed)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failures = [(name, check) for name, check in results['cache'].items() if not check['ok']]
+    for name, check in failures:
+        print(f"FAIL {name}: {check['output']} requests, expected {check['expected']}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,115 @@
 # REPLACE FILE: chat_gui.py
 # This replaces your existing chat_gui.py with enhanced screen vision capabilities
 
+import time
+
+# Start-up is timed from here (--profile-startup)
+STARTUP_TIME = time.perf_counter()
+
 import customtkinter as ctk
-import cv2
-import numpy as np
-import pyautogui
-import pygetwindow as gw
-from PIL import Image, ImageTk
-import mss
+import importlib
+import re
 import threading
-import time
-import pytesseract
-from slicer_control import handle_command
+from vision_pipeline import VisionPipeline, merge_newer
+from adaptive_scheduler import AdaptiveCaptureScheduler
+from profiling import profiler, in_range
 
-# Configure pyautogui
-pyautogui.FAILSAFE = True
-pyautogui.PAUSE = 0.1
+# Vision (OpenCV/NumPy), OCR, GUI automation, slicer control and the chat
+# client are imported where they are first used, and preloaded on a warm-up
+# thread once the window is drawn, so none of them delays the first paint
+profiler.record("startup.imports", time.perf_counter() - STARTUP_TIME)
 
 # Configure appearance
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
 CAPTURE_INTERVAL = 2.0
+MIN_CAPTURE_INTERVAL = 0.25
+MAX_CAPTURE_INTERVAL = 10.0
+CPU_BUDGET = 50.0
+ANALYSIS_WORKERS = 2
+PROFILE_EXPORT_INTERVAL = 10.0
+
+# Detections drawn over the screen preview
+PREVIEW_SECTIONS = ('buttons', 'progress_bars')
+
+# Analysis lines written by describe_telemetry
+TELEMETRY_PREFIXES = ("⏳ ", "⚠️ ")
+
+# Chat input that is exactly one of these commands ("slice", "print the plate")
+# presses its Bambu Studio shortcut
+STUDIO_COMMAND = re.compile(r"(slice|print|open|center)(?: (?:the )?(?:model|plate|file|project))?[.!]?",
+                            re.IGNORECASE)
+
+# Without the chat API, input mentioning one of these gets the screen analysis
+VISION_KEYWORDS = ('see', 'screen', 'what', 'show', 'display', 'visible')
+
+# Chat input starting with one of these (or ending in "?") is a question
+QUESTION_WORDS = ('what', 'where', 'which', 'who', 'why', 'how', 'when', 'is', 'are', 'was', 'were',
+                  'do', 'does', 'did', 'can', 'could', 'should', 'will', 'would', 'has', 'have')
+
+# Slow imports preloaded by the warm-up thread, in dependency order
+WARM_MODULES = ('numpy', 'cv2', 'PIL.Image', 'pytesseract', 'mss', 'pygetwindow', 'pyautogui')
+
+def gui_automation():
+    """pyautogui, imported and configured on first use"""
+    import pyautogui
+    pyautogui.FAILSAFE = True
+    pyautogui.PAUSE = 0.1
+    return pyautogui
+
+def is_question(text):
+    """Whether chat input asks something rather than giving a command"""
+    words = text.lower().split()
+    return text.rstrip().endswith("?") or (bool(words) and words[0] in QUESTION_WORDS)
+
+def studio_action(text):
+    """The Bambu Studio action an exact command names, or None"""
+    match = STUDIO_COMMAND.fullmatch(" ".join(text.split()))
+    return match.group(1).lower() if match else None
+
+def mentions_screen(text):
+    """Whether chat input asks about the screen, by keyword"""
+    return any(word in VISION_KEYWORDS for word in re.findall(r"[a-z]+", text.lower()))
+
+def shift(rect, offset):
+    """Move an (x, y, w, h) rect found inside a tile into frame coordinates"""
+    x, y, w, h = rect
+    return x + offset[0], y + offset[1], w, h
+
+def join_touching(rects):
+    """Union rects that overlap or touch, such as the parts of a shape split by tile edges"""
+    rects = list(rects)
+    i = 0
+    while i < len(rects):
+        x, y, w, h = rects[i]
+        for j in range(i + 1, len(rects)):
+            bx, by, bw, bh = rects[j]
+            if x <= bx + bw and bx <= x + w and y <= by + bh and by <= y + h:
+                x1, y1 = min(x, bx), min(y, by)
+                rects[i] = (x1, y1, max(x + w, bx + bw) - x1, max(y + h, by + bh) - y1)
+                del rects[j]
+                break
+        else:
+            i += 1
+    return rects
+
+def warm_import(name):
+    """Import a module ahead of its first use, timed as a start-up stage"""
+    try:
+        with profiler.stage(f"startup.import.{name}"):
+            importlib.import_module(name)
+        return True
+    except Exception:
+        # Missing optional modules are reported where they are used
+        return False
 
 class BambuAIAssistant(ctk.CTk):
-    def __init__(self, capture_interval: float = CAPTURE_INTERVAL):
+    def __init__(self, capture_interval: float = CAPTURE_INTERVAL, layout_name: str = None,
+                 min_interval: float = MIN_CAPTURE_INTERVAL, max_interval: float = MAX_CAPTURE_INTERVAL,
+                 cpu_budget: float = CPU_BUDGET, profile_log: str = None,
+                 record_path: str = None, replay_path: str = None, replay_speed: float = 1.0,
+                 profile_startup: bool = False):
         super().__init__()
         self.title("Bambu AI Assistant - Live Vision")
         self.geometry("800x700")
@@ -35,9 +120,49 @@ class BambuAIAssistant(ctk.CTk):
         self.current_screenshot = None
         self.vision_analysis = ""
         self.capture_interval = capture_interval
+        self.layout_name = layout_name
+        self.layout_profiles = None
+        self.layout_profile = None
+        self.layout_profile_size = None
+        self.studio_version = None
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        # Built by init_engines() on the warm-up thread after the first paint
+        self.grabber = None
+        self.recorder = None
+        self.change_detector = None
+        self.telemetry = None
+        self.preview = None
+        self.vision = None
+        self.pipeline = None
+        self.chat_stream = None
+        self.locate_helper = None
+        self.engines_ready = threading.Event()
+        self.last_analysis = None
+        self.tile_stats = {}
+        self.tile_words = {}
+        self.region_text = {}
+        self.tile_stats_shape = None
+        self.analysis_lock = threading.Lock()
+        self.reply_id = 0
+        self.scheduler = AdaptiveCaptureScheduler(
+            base_interval=capture_interval,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            cpu_budget=cpu_budget,
+        )
+        
+        self.profile_log = profile_log
+        self.profile_startup = profile_startup
+        self.profile_panel_visible = False
         
-        self.setup_ui()
-        self.find_bambu_studio()
+        with profiler.stage("startup.ui"):
+            self.setup_ui()
+        # Everything heavy loads once the window is on screen
+        self.after_idle(self.start_warm_up)
+        if self.profile_log:
+            self.export_profile()
         
     def setup_ui(self):
         # Main container
@@ -54,10 +179,24 @@ class BambuAIAssistant(ctk.CTk):
         self.vision_toggle = ctk.CTkSwitch(
             self.status_frame, 
             text="Live Vision", 
-            command=self.toggle_vision
+            command=self.toggle_vision,
+            state="disabled"  # Until the vision engines are loaded
         )
         self.vision_toggle.pack(side="right", padx=10, pady=5)
         
+        self.pipeline_label = ctk.CTkLabel(self.status_frame, text="")
+        self.pipeline_label.pack(side="right", padx=10, pady=5)
+        
+        self.profile_button = ctk.CTkButton(
+            self.status_frame, text="▸ Latency", width=90, command=self.toggle_profile_panel
+        )
+        self.profile_button.pack(side="right", padx=10, pady=5)
+        
+        # Per-stage timings, hidden until expanded
+        self.profile_frame = ctk.CTkFrame(self.main_frame)
+        self.profile_text = ctk.CTkTextbox(self.profile_frame, height=160, font=("Courier", 11))
+        self.profile_text.pack(fill="both", expand=True, padx=10, pady=5)
+        
         # Screen preview (small)
         self.preview_frame = ctk.CTkFrame(self.main_frame)
         self.preview_frame.pack(fill="x", padx=5, pady=5)
@@ -93,106 +232,262 @@ class BambuAIAssistant(ctk.CTk):
         self.entry = ctk.CTkEntry(self.input_frame, placeholder_text="Ask about what you see or give commands...")
         self.entry.pack(side="left", fill="x", expand=True, padx=10, pady=5)
         self.entry.bind("<Return>", self.process_input)
+        self.entry.bind("<Key>", lambda event: self.scheduler.on_user_activity())
         
         self.send_button = ctk.CTkButton(self.input_frame, text="Send", command=self.process_input)
         self.send_button.pack(side="right", padx=10, pady=5)
         
+        self.stop_button = ctk.CTkButton(self.input_frame, text="Stop", width=60, command=self.stop_reply,
+                                         state="disabled")
+        self.stop_button.pack(side="right", padx=(10, 0), pady=5)
+        
+    def start_warm_up(self):
+        """Load the vision, OCR and chat engines in the background (first paint is done)"""
+        profiler.record("startup.first_paint", time.perf_counter() - STARTUP_TIME)
+        threading.Thread(target=self.init_engines, name="warm-up", daemon=True).start()
+    
+    def init_engines(self):
+        """Import and set up everything heavy (runs on the warm-up thread)"""
+        try:
+            # Questions that are not commands go to the chat API when a key is set
+            with profiler.stage("startup.chat"):
+                self.chat_stream = self.create_chat_stream()
+            
+            for name in WARM_MODULES:
+                warm_import(name)
+            
+            with profiler.stage("startup.capture"):
+                from layout_profile import load_profiles
+                from frame_change import FrameChangeDetector, merge_dirty_tiles
+                from screen_grabber import ScreenGrabber
+                from frame_recorder import FrameRecorder, ReplaySource
+                from telemetry import TelemetryStore
+                from preview_renderer import PreviewRenderer
+                
+                self.layout_profiles = load_profiles()
+                # A replayed recording stands in for the screen and sets its own pace
+                self.grabber = (ReplaySource(self.replay_path, speed=self.replay_speed)
+                                if self.replay_path else ScreenGrabber())
+                self.recorder = FrameRecorder(self.record_path) if self.record_path else None
+                self.change_detector = FrameChangeDetector()
+                self.telemetry = TelemetryStore()
+                self.preview = PreviewRenderer()
+                self.pipeline = VisionPipeline(
+                    self.capture_stage,
+                    self.analysis_stage,
+                    self.publish_stage,
+                    interval=0.0 if self.replay_path else self.capture_interval,
+                    workers=ANALYSIS_WORKERS,
+                    merge_fn=merge_dirty_tiles,
+                    scheduler=None if self.replay_path else self.scheduler,
+                )
+            
+            with profiler.stage("startup.find_window"):
+                self.find_bambu_studio()
+            
+            # Includes the Tesseract check
+            with profiler.stage("startup.vision"):
+                from advanced_vision import AdvancedBambuVision
+                self.vision = AdvancedBambuVision()
+            
+            with profiler.stage("startup.ocr"):
+                from ocr_service import get_ocr_service
+                from digit_reader import get_digit_reader
+                get_ocr_service()
+                get_digit_reader()
+        except Exception as e:
+            profiler.count("errors.startup")
+            print(f"Startup error: {e}")
+        self.after(0, self.on_engines_ready)
+    
+    def on_engines_ready(self):
+        """Enable live vision once the warm-up finished (runs in main thread)"""
+        self.engines_ready.set()
+        profiler.record("startup.ready", time.perf_counter() - STARTUP_TIME)
+        if self.pipeline is not None and self.vision is not None:
+            self.vision_toggle.configure(state="normal")
+        if self.profile_startup:
+            print(self.startup_report())
+            self.destroy()
+    
+    def startup_report(self):
+        """Import and initialization times of this start, as a plain-text table"""
+        stages = profiler.snapshot()['stages']
+        lines = [f"{'startup stage':<34}{'ms':>9}"]
+        for name, stats in stages.items():
+            if name.startswith("startup.") and 'last_ms' in stats:
+                failed = "  (failed)" if stats['errors'] else ""
+                lines.append(f"{name[len('startup.'):]:<34}{stats['last_ms']:>9.1f}{failed}")
+        return "\n".join(lines)
+    
+    def show_status(self, text):
+        """Set the status line from any thread"""
+        self.after(0, lambda: self.status_label.configure(text=text))
+    
     def find_bambu_studio(self):
         """Find Bambu Studio window"""
         try:
+            import pygetwindow as gw
+            from layout_profile import studio_version_from_title
             windows = gw.getAllWindows()
             for window in windows:
                 if "bambu" in window.title.lower() or "studio" in window.title.lower():
                     self.bambu_window = window
-                    self.status_label.configure(text=f"Status: Connected to {window.title}")
+                    self.grabber.set_window(window)
+                    # Layout profiles can be specific to a Studio version
+                    self.studio_version = studio_version_from_title(window.title)
+                    self.show_status(f"Status: Connected to {window.title}")
                     return True
-            self.status_label.configure(text="Status: Bambu Studio not found")
+            self.show_status("Status: Bambu Studio not found")
             return False
         except Exception as e:
-            self.status_label.configure(text=f"Status: Error - {str(e)}")
+            self.show_status(f"Status: Error - {str(e)}")
             return False
     
     def toggle_vision(self):
         """Toggle live vision capture"""
         if self.vision_toggle.get():
             self.screen_capture_active = True
-            self.start_vision_thread()
+            self.pipeline.start()
+            self.update_pipeline_stats()
+            self.refresh_preview()
         else:
             self.screen_capture_active = False
+            self.pipeline.stop()
+            self.pipeline_label.configure(text="")
     
-    def start_vision_thread(self):
-        """Start the vision capture thread"""
-        vision_thread = threading.Thread(target=self.vision_loop, daemon=True)
-        vision_thread.start()
+    def on_replay_finished(self):
+        """Switch live vision off at the end of a replay (runs in main thread)"""
+        self.vision_toggle.deselect()
+        self.toggle_vision()
+        self.show_status("Status: Replay finished")
     
-    def vision_loop(self):
-        """Main vision capture loop"""
-        while self.screen_capture_active:
-            try:
-                self.capture_and_analyze()
-                time.sleep(self.capture_interval)
-            except Exception as e:
-                print(f"Vision error: {e}")
-                time.sleep(1)
+    def update_pipeline_stats(self):
+        """Show achieved frame rate and capture-to-display latency"""
+        if not self.screen_capture_active:
+            return
+        stats = self.pipeline.stats()
+        self.pipeline_label.configure(
+            text=f"Capture {self.scheduler.rate:.1f}/s · {stats['fps']:.1f} fps · {stats['latency_ms']:.0f} ms"
+        )
+        self.after(1000, self.update_pipeline_stats)
+    
+    def toggle_profile_panel(self):
+        """Show or hide the per-stage latency panel"""
+        self.profile_panel_visible = not self.profile_panel_visible
+        if self.profile_panel_visible:
+            self.profile_frame.pack(fill="x", padx=5, pady=5, after=self.status_frame)
+            self.profile_button.configure(text="▾ Latency")
+            self.update_profile_panel()
+        else:
+            self.profile_frame.pack_forget()
+            self.profile_button.configure(text="▸ Latency")
+    
+    def update_profile_panel(self):
+        """Refresh the latency panel while it is open"""
+        if not self.profile_panel_visible:
+            return
+        self.profile_text.delete(1.0, "end")
+        self.profile_text.insert(1.0, profiler.format_table())
+        self.after(1000, self.update_profile_panel)
+    
+    def export_profile(self):
+        """Append a profile snapshot to the --profile-log file every few seconds"""
+        profiler.export_jsonl(self.profile_log)
+        self.after(int(PROFILE_EXPORT_INTERVAL * 1000), self.export_profile)
     
     def capture_screen(self):
-        """Capture Bambu Studio window or full screen"""
+        """Capture Bambu Studio window (focused or not) or the primary monitor
+        
+        Returns a BGRA Frame viewing the grabbed pixels without copying.
+        """
         try:
-            with mss.mss() as sct:
-                if self.bambu_window and self.bambu_window.isActive:
-                    monitor = {
-                        "top": self.bambu_window.top,
-                        "left": self.bambu_window.left,
-                        "width": self.bambu_window.width,
-                        "height": self.bambu_window.height,
-                    }
-                else:
-                    monitor = sct.monitors[0]
-
-                sct_img = sct.grab(monitor)
-                img = np.array(sct_img)
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
-                return img
+            return self.grabber.grab()
         except Exception as e:
+            profiler.count("errors.capture")
             print(f"Screenshot error: {e}")
             return None
     
-    def analyze_screen_content(self, image):
-        """Analyze screen content using computer vision"""
+    def analyze_screen_content(self, image, dirty_tiles=None, seq=None):
+        """Analyze screen content using computer vision
+        
+        When dirty_tiles is given, only those tiles are re-analyzed and the
+        cached results of the other tiles are reused. Several frames may be
+        analyzed at once; per-tile results from older frames never replace
+        newer ones.
+        """
+        from frame import as_frame
+        from frame_change import boxes_intersect
+        from layout_profile import read_regions
+        
         analysis = []
         
         try:
-            # Convert to grayscale for text detection
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            frame = as_frame(image)
+            tiles = self.change_detector.tiles(frame.shape)
+            with self.analysis_lock:
+                if seq is None:
+                    seq = next(self.pipeline.seq)
+                if self.tile_stats_shape != frame.shape[:2]:
+                    self.tile_stats = {}
+                    self.tile_words = {}
+                    self.region_text = {}
+                    self.tile_stats_shape = frame.shape[:2]
+                    dirty_tiles = None
+            if dirty_tiles is None:
+                dirty_tiles = list(tiles)
             
             # Text extraction
+            regions = {}
+            words = {}
             try:
-                text = pytesseract.image_to_string(gray)
-                if text.strip():
-                    bambu_keywords = ['print', 'filament', 'bed', 'temperature', 'layer', 'speed']
-                    found_keywords = [word for word in bambu_keywords if word in text.lower()]
-                    if found_keywords:
-                        analysis.append(f"Detected Bambu Studio elements: {', '.join(found_keywords)}")
+                profile = self.get_layout_profile(frame)
+                if profile is not None:
+                    dirty_boxes = [tiles[tile] for tile in dirty_tiles]
+                    names = [name for name in profile.regions
+                             if any(boxes_intersect(profile.region_box(name, frame.shape), box)
+                                    for box in dirty_boxes)]
+                    regions = read_regions(frame.gray, profile, names=names)
+                else:
+                    words = self.read_tile_words(frame, tiles, dirty_tiles)
             except:
-                pass
+                profiler.count("errors.text_extraction")
             
-            # Color analysis for status indicators
-            hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+            # Color and edge statistics run on a coarse pyramid level
+            level = frame.pyramid_level()
+            stats = {}
+            with profiler.stage("analysis.tile_stats"):
+                for tile in dirty_tiles:
+                    x, y, w, h = tiles[tile]
+                    stats[tile] = self.compute_tile_stats(frame.crop(x, y, w, h), level, offset=(x, y))
             
-            # Check for green (ready/good status)
-            green_mask = cv2.inRange(hsv, np.array([40, 50, 50]), np.array([80, 255, 255]))
-            green_pixels = cv2.countNonZero(green_mask)
+            with self.analysis_lock:
+                merge_newer(self.region_text, regions, seq)
+                merge_newer(self.tile_words, words, seq)
+                merge_newer(self.tile_stats, stats, seq)
+                region_text = {name: region for name, (_, region) in self.region_text.items()}
+                all_words = [word for _, tile_words in self.tile_words.values() for word in tile_words]
+                all_stats = [tile_stats for _, tile_stats in self.tile_stats.values()]
             
-            # Check for red (error/heating)
-            red_mask1 = cv2.inRange(hsv, np.array([0, 50, 50]), np.array([10, 255, 255]))
-            red_mask2 = cv2.inRange(hsv, np.array([170, 50, 50]), np.array([180, 255, 255]))
-            red_pixels = cv2.countNonZero(red_mask1) + cv2.countNonZero(red_mask2)
+            if region_text:
+                text = "\n".join(region['text'] for region in region_text.values())
+                analysis.extend(self.describe_readouts(region_text))
+                self.record_telemetry(region_text, frame.timestamp)
+                analysis.extend(self.describe_telemetry())
+            else:
+                text = " ".join(all_words)
+            if text.strip():
+                bambu_keywords = ['print', 'filament', 'bed', 'temperature', 'layer', 'speed']
+                found_keywords = [word for word in bambu_keywords if word in text.lower()]
+                if found_keywords:
+                    analysis.append(f"Detected Bambu Studio elements: {', '.join(found_keywords)}")
             
-            # Check for blue (cooling/info)
-            blue_mask = cv2.inRange(hsv, np.array([100, 50, 50]), np.array([130, 255, 255]))
-            blue_pixels = cv2.countNonZero(blue_mask)
+            green_pixels = sum(tile['green'] for tile in all_stats)
+            red_pixels = sum(tile['red'] for tile in all_stats)
+            blue_pixels = sum(tile['blue'] for tile in all_stats)
+            contour_count = sum(tile['contours'] for tile in all_stats)
             
-            total_pixels = image.shape[0] * image.shape[1]
+            total_pixels = frame.height * frame.width
             
             if green_pixels > total_pixels * 0.01:
                 analysis.append("🟢 Green indicators detected (possibly ready/good status)")
@@ -201,43 +496,246 @@ class BambuAIAssistant(ctk.CTk):
             if blue_pixels > total_pixels * 0.01:
                 analysis.append("🔵 Blue indicators detected (possibly cooling/info)")
             
-            # Edge detection for model preview
-            edges = cv2.Canny(gray, 50, 150)
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if len(contours) > 10:
-                analysis.append(f"📐 Detected {len(contours)} shapes/objects (possibly 3D model preview)")
+            if contour_count > 10:
+                analysis.append(f"📐 Detected {contour_count} shapes/objects (possibly 3D model preview)")
             
         except Exception as e:
+            profiler.count("errors.analysis")
             analysis.append(f"Analysis error: {str(e)}")
         
         return analysis if analysis else ["Screen captured, no specific patterns detected"]
     
-    def capture_and_analyze(self):
-        """Capture screen and perform analysis"""
+    def compute_tile_stats(self, tile, level=0, offset=(0, 0)):
+        """Count status colors and edge contours inside one tile (a Frame)
+        
+        Pixel counts from a coarse pyramid level are scaled back to full size.
+        The button- and bar-shaped blobs of the same masks and edges are kept,
+        in frame coordinates, for the preview overlays.
+        """
+        import cv2
+        import numpy as np
+        from blob_analysis import blob_stats
+        
+        tile = tile.level(level)
+        scale = 1 << level
+        pixel_scale = 4 ** level
+        
+        # Color analysis for status indicators
+        hsv = tile.hsv
+        
+        # Check for green (ready/good status)
+        green_mask = in_range(hsv, np.array([40, 50, 50]), np.array([80, 255, 255]))
+        
+        # Check for red (error/heating)
+        red_mask1 = in_range(hsv, np.array([0, 50, 50]), np.array([10, 255, 255]))
+        red_mask2 = in_range(hsv, np.array([170, 50, 50]), np.array([180, 255, 255]))
+        
+        # Check for blue (cooling/info)
+        blue_mask = in_range(hsv, np.array([100, 50, 50]), np.array([130, 255, 255]))
+        
+        # Orange is only needed for the Slice button
+        orange_mask = in_range(hsv, np.array([10, 50, 50]), np.array([25, 255, 255]))
+        
+        # Edge detection for model preview
+        edge_blobs = blob_stats(tile.edges).scaled(scale)
+        
+        # Same size limits as BambuVisionHelper.find_buttons_by_color and
+        # AdvancedBambuVision.find_progress_indicators
+        buttons = []
+        for color, mask in (('orange', orange_mask), ('green', green_mask), ('blue', blue_mask)):
+            blobs = blob_stats(mask).scaled(scale)
+            w, h = blobs.width, blobs.height
+            blobs = blobs[(w > 50) & (w < 200) & (h > 20) & (h < 60)]
+            buttons.extend({'position': shift(blobs[i], offset), 'color': color} for i in range(len(blobs)))
+        # Text can form a wide blob on a coarse level too, but with many more corners
+        w, h = edge_blobs.width, edge_blobs.height
+        bars = edge_blobs[(w > 100) & (h > 10) & (w > h * 3) & (edge_blobs.vertices <= 24)]
+        
+        return {
+            'green': cv2.countNonZero(green_mask) * pixel_scale,
+            'red': (cv2.countNonZero(red_mask1) + cv2.countNonZero(red_mask2)) * pixel_scale,
+            'blue': cv2.countNonZero(blue_mask) * pixel_scale,
+            'contours': len(edge_blobs),
+            'buttons': buttons,
+            'progress_bars': [{'position': shift(bars[i], offset)} for i in range(len(bars))],
+        }
+    
+    def read_tile_words(self, frame, tiles, dirty_tiles):
+        """OCR the bounding box of the dirty tiles and return {tile: words}"""
+        from ocr_cache import tiled_image_to_data
+        
+        boxes = [tiles[tile] for tile in dirty_tiles]
+        x1 = min(box[0] for box in boxes)
+        y1 = min(box[1] for box in boxes)
+        x2 = max(box[0] + box[2] for box in boxes)
+        y2 = max(box[1] + box[3] for box in boxes)
+        
+        # Every tile fully inside the OCR'd box gets refreshed
+        covered = [tile for tile, (x, y, w, h) in tiles.items()
+                   if x >= x1 and y >= y1 and x + w <= x2 and y + h <= y2]
+        words = {tile: [] for tile in covered}
+        
+        gray = frame.gray[y1:y2, x1:x2]
+        data = tiled_image_to_data(gray)
+        for i, word in enumerate(data['text']):
+            if not word or not word.strip():
+                continue
+            cx = x1 + data['left'][i] + data['width'][i] // 2
+            cy = y1 + data['top'][i] + data['height'][i] // 2
+            for tile in covered:
+                x, y, w, h = tiles[tile]
+                if x <= cx < x + w and y <= cy < y + h:
+                    words[tile].append(word)
+                    break
+        return words
+    
+    def get_layout_profile(self, frame):
+        """Return the layout profile for a window capture, or None for full screen"""
+        from layout_profile import select_profile
+        
+        if not frame.window:
+            return None
+        height, width = frame.shape[:2]
+        if self.layout_profile_size != (width, height):
+            self.layout_profile = select_profile(
+                width, height, version=self.studio_version, profiles=self.layout_profiles, name=self.layout_name
+            )
+            self.layout_profile_size = (width, height)
+        return self.layout_profile
+    
+    def describe_readouts(self, regions):
+        """Turn OCR'd layout regions into analysis lines"""
+        labels = {
+            'nozzle_temp': "🌡️ Nozzle",
+            'bed_temp': "🌡️ Bed",
+            'print_progress': "📊 Progress",
+            'print_time': "⏱️ Print time",
+            'layer_height': "📏 Layer height",
+            'file_name': "📄 File",
+        }
+        lines = []
+        for name, label in labels.items():
+            text = regions.get(name, {}).get('text', '').strip()
+            if text:
+                lines.append(f"{label}: {text}")
+        return lines
+    
+    def record_telemetry(self, regions, timestamp):
+        """Add the temperature and progress readouts to the telemetry history"""
+        from layout_profile import parse_number
+        
+        readouts = {
+            'nozzle_temp': 'nozzle_temp',
+            'bed_temp': 'bed_temp',
+            'progress': 'print_progress',
+        }
+        metrics = {metric: parse_number(regions.get(name, {}).get('text', ''))
+                   for metric, name in readouts.items()}
+        self.telemetry.record(timestamp, **metrics)
+    
+    def describe_telemetry(self):
+        """ETA and alerts derived from the telemetry history"""
+        lines = []
+        eta = self.telemetry.eta()
+        if eta is not None:
+            hours, minutes = divmod(int(eta // 60), 60)
+            lines.append(f"⏳ Estimated time left: {hours}h {minutes:02d}m")
+        lines.extend(f"⚠️ {alert}" for alert in self.telemetry.anomalies())
+        return lines
+    
+    @profiler.timed("pipeline.capture")
+    def capture_stage(self):
+        """Pipeline stage 1: grab a frame, skipping it when nothing changed"""
         screenshot = self.capture_screen()
-        if screenshot is not None:
-            self.current_screenshot = screenshot
-            
-            # Create thumbnail for preview
-            thumbnail = Image.fromarray(screenshot)
-            thumbnail.thumbnail((200, 150))
-            thumbnail_tk = ImageTk.PhotoImage(thumbnail)
-            
-            # Update preview (must be done in main thread)
-            self.after(0, self.update_preview, thumbnail_tk)
-            
-            # Analyze content
-            analysis = self.analyze_screen_content(screenshot)
-            analysis_text = "\n".join(analysis)
-            
-            # Update analysis (must be done in main thread)
-            self.after(0, self.update_analysis, analysis_text)
+        if screenshot is None:
+            # A replayed recording has run out; end capturing instead of polling it
+            if getattr(self.grabber, 'finished', False):
+                self.after(0, self.on_replay_finished)
+                raise StopIteration
+            return None
+        self.current_screenshot = screenshot
+        if self.recorder is not None:
+            self.recorder.write(screenshot)
+        
+        # Idle screens reuse the previous analysis; their readouts still
+        # count as samples so a print stalled on a static screen is noticed
+        change = self.change_detector.update(screenshot.pixels)
+        self.scheduler.on_frame(change.changed)
+        if not change.changed and self.last_analysis is not None:
+            if self.telemetry.heartbeat(screenshot.timestamp):
+                self.after(0, self.refresh_telemetry)
+            return None
+        
+        # Only the dirty tiles are re-analyzed when part of the screen changed
+        return screenshot, change.dirty_tiles if change.partial else None
+    
+    @profiler.timed("pipeline.analysis")
+    def analysis_stage(self, item):
+        """Pipeline stage 2: analyze a frame on one of the worker threads"""
+        analysis = self.analyze_screen_content(item.image, item.meta, seq=item.seq)
+        
+        # Draw the preview here, off the main thread, from the shapes the
+        # tile analysis already found
+        overlays = self.overlay_shapes()
+        overlays['readouts'] = self.readout_boxes()
+        self.preview.render(item.image, overlays, seq=item.seq)
+        
+        return analysis
+    
+    def publish_stage(self, item):
+        """Pipeline stage 3: hand the result to the main thread"""
+        self.after(0, self.show_result, item)
     
-    def update_preview(self, thumbnail_tk):
-        """Update screen preview in UI"""
-        self.screen_preview.configure(image=thumbnail_tk, text="")
-        self.screen_preview.image = thumbnail_tk  # Keep reference
+    @profiler.timed("ui.update")
+    def show_result(self, item):
+        """Display an analyzed frame (runs in main thread)"""
+        analysis = item.result
+        self.last_analysis = analysis
+        self.update_analysis("\n".join(analysis))
+        self.pipeline.mark_displayed(item)
+    
+    def overlay_shapes(self):
+        """Buttons and progress bars for the preview, joined from the latest tile stats"""
+        with self.analysis_lock:
+            all_stats = [tile_stats for _, tile_stats in self.tile_stats.values()]
+        buttons = {}
+        for button in (button for tile in all_stats for button in tile['buttons']):
+            buttons.setdefault(button['color'], []).append(button['position'])
+        bars = [bar['position'] for tile in all_stats for bar in tile['progress_bars']]
+        return {
+            'buttons': [{'position': rect, 'color': color}
+                        for color, rects in buttons.items() for rect in join_touching(rects)],
+            'progress_bars': [{'position': rect} for rect in join_touching(bars)],
+        }
+    
+    def readout_boxes(self):
+        """(box, kind) of the numeric readout regions last read"""
+        from layout_profile import DIGIT_KINDS
+        
+        with self.analysis_lock:
+            regions = [region for _, region in self.region_text.values()]
+        return [(region['box'], region['kind']) for region in regions
+                if region.get('kind') in DIGIT_KINDS]
+    
+    def refresh_preview(self):
+        """Show the newest rendered preview, at the renderer's capped rate"""
+        if not self.screen_capture_active:
+            return
+        self.preview.present(self.screen_preview)
+        self.after(self.preview.interval_ms, self.refresh_preview)
+    
+    def refresh_telemetry(self):
+        """Update the ETA and alerts of the shown analysis between analyzed frames (runs in main thread)"""
+        if self.last_analysis is None:
+            return
+        old = [line for line in self.last_analysis if line.startswith(TELEMETRY_PREFIXES)]
+        new = self.describe_telemetry()
+        if new == old:
+            return
+        at = self.last_analysis.index(old[0]) if old else len(self.last_analysis)
+        kept = [line for line in self.last_analysis if not line.startswith(TELEMETRY_PREFIXES)]
+        self.last_analysis = kept[:at] + new + kept[at:]
+        self.update_analysis("\n".join(self.last_analysis))
     
     def update_analysis(self, analysis_text):
         """Update analysis text in UI"""
@@ -250,6 +748,8 @@ class BambuAIAssistant(ctk.CTk):
             return "Bambu Studio window not found"
         
         try:
+            pyautogui = gui_automation()
+            
             # Bring Bambu Studio to front
             self.bambu_window.activate()
             time.sleep(0.5)
@@ -278,39 +778,152 @@ class BambuAIAssistant(ctk.CTk):
         except Exception as e:
             return f"Control error: {str(e)}"
     
+    def create_chat_stream(self):
+        """Streaming chat API client, or None when no API key is set"""
+        from chat_api_client import ChatAPIClient
+        from chat_stream import ChatStream
+        from response_cache import CachedChatClient
+        from conversation import Conversation
+        
+        try:
+            # Repeat questions about an unchanged screen are answered from the cache
+            return ChatStream(CachedChatClient(ChatAPIClient(conversation=Conversation())))
+        except ValueError as e:
+            print(f"Chat API disabled: {e}")
+            return None
+    
+    def start_reply(self, user_input):
+        """Stream the chat API's answer into the chat log"""
+        self.reply_id += 1
+        reply_id = self.reply_id
+        self.chat_log.insert("end", "AI: ")
+        self.chat_log.see("end")
+        self.stop_button.configure(state="normal")
+        # The stream calls back from its own thread; Tk work goes through after()
+        self.chat_stream.start(
+            user_input,
+            lambda text: self.after(0, self.append_reply, reply_id, text),
+            lambda error: self.after(0, self.finish_reply, reply_id, error),
+            screen=self.last_analysis,
+        )
+    
+    @profiler.timed("ui.chat")
+    def append_reply(self, reply_id, text):
+        """Add one batch of streamed tokens (runs in main thread)"""
+        if reply_id != self.reply_id:
+            return  # Late batch of a stopped answer
+        self.chat_log.insert("end", text)
+        self.chat_log.see("end")
+    
+    def finish_reply(self, reply_id, error=None):
+        """End a streamed answer (runs in main thread)"""
+        if reply_id != self.reply_id:
+            return
+        self.reply_id += 1
+        self.chat_log.insert("end", f"\n⚠️ Chat API error: {error}\n" if error else "\n")
+        self.chat_log.see("end")
+        self.stop_button.configure(state="disabled")
+    
+    def stop_reply(self):
+        """Cancel the answer that is still streaming, if any"""
+        if self.chat_stream is None or not self.chat_stream.cancel():
+            return
+        self.reply_id += 1
+        self.chat_log.insert("end", " [stopped]\n")
+        self.chat_log.see("end")
+        self.stop_button.configure(state="disabled")
+    
+    def locate_query(self, user_input):
+        """Detector outputs for a "where is X" question, or None for other input"""
+        from realtime_helper import outputs_for_query, SUGGESTION_LABELS
+        
+        words = user_input.lower().split()
+        if not words or words[0] not in ("where", "find", "locate"):
+            return None
+        outputs = outputs_for_query(user_input)
+        # Only elements with a position can be pointed at
+        return outputs if set(outputs) <= set(SUGGESTION_LABELS) else None
+    
+    def locate_elements(self, user_input):
+        """Run only the detectors a "where is X" question needs, off the main thread"""
+        screenshot = self.current_screenshot
+        if screenshot is None:
+            self.show_reply("No screen capture available. Enable 'Live Vision' first.")
+            return
+        
+        def locate():
+            from realtime_helper import BambuVisionHelper, get_smart_suggestions
+            try:
+                if self.locate_helper is None:
+                    self.locate_helper = BambuVisionHelper(layout_profile=self.layout_profile)
+                result = get_smart_suggestions(user_input, image=screenshot, helper=self.locate_helper)
+                lines = [f"📍 {label} at {position}" for label, position in result['suggestions']]
+                lines += [f"💡 {tip}" for tip in result['recommendations']]
+                response = "\n".join(lines) or "I could not find that on the screen."
+            except Exception as e:
+                profiler.count("errors.locate")
+                response = f"Detection error: {e}"
+            self.after(0, self.show_reply, response)
+        
+        threading.Thread(target=locate, name="locate", daemon=True).start()
+    
+    def screen_summary(self):
+        """The latest screen analysis, for questions asked without the chat API"""
+        if self.last_analysis is not None:
+            return "🔍 Current screen analysis:\n" + "\n".join(self.last_analysis)
+        if self.current_screenshot is not None:
+            analysis = self.analyze_screen_content(self.current_screenshot)
+            return "🔍 Current screen analysis:\n" + "\n".join(analysis)
+        return "No screen capture available. Enable 'Live Vision' first."
+    
+    def show_reply(self, response):
+        """Add a complete answer to the chat log (runs in main thread)"""
+        self.chat_log.insert("end", f"AI: {response}\n")
+        self.chat_log.see("end")
+    
     def process_input(self, event=None):
         """Process user input"""
         user_input = self.entry.get().strip()
         if not user_input:
             return
         
+        # A new question replaces the answer still streaming
+        self.stop_reply()
         self.chat_log.insert("end", f"You: {user_input}\n")
         self.entry.delete(0, 'end')
         
-        # Check if it's a vision-related question
-        vision_keywords = ["see", "screen", "what", "show", "display", "visible"]
-        control_keywords = ["slice", "print", "open", "center", "click"]
+        # "Where is the slice button" runs the slice button detector alone
+        if self.locate_query(user_input) is not None:
+            self.locate_elements(user_input)
+            return
+        
+        from slicer_control import handle_command, UNKNOWN_COMMAND
         
-        if any(keyword in user_input.lower() for keyword in vision_keywords):
-            if self.current_screenshot is not None:
-                analysis = self.analyze_screen_content(self.current_screenshot)
-                response = "🔍 Current screen analysis:\n" + "\n".join(analysis)
+        action = studio_action(user_input)
+        if action is not None:
+            # Only an exact command presses a shortcut, never "print is slow?"
+            response = self.control_bambu_studio(action)
+        
+        elif self.chat_stream is None:
+            # Without the chat API, screen questions get the analysis by keyword
+            if mentions_screen(user_input) or is_question(user_input):
+                response = self.screen_summary()
             else:
-                response = "No screen capture available. Enable 'Live Vision' first."
+                response = handle_command(user_input)
         
-        elif any(keyword in user_input.lower() for keyword in control_keywords):
-            # Extract action
-            for keyword in control_keywords:
-                if keyword in user_input.lower():
-                    response = self.control_bambu_studio(keyword)
-                    break
+        elif is_question(user_input):
+            # Questions are answered by the chat API, with the screen analysis as context
+            self.start_reply(user_input)
+            return
         
         else:
             # Use existing slicer control
             response = handle_command(user_input)
+            if response == UNKNOWN_COMMAND and self.chat_stream is not None:
+                self.start_reply(user_input)
+                return
         
-        self.chat_log.insert("end", f"AI: {response}\n")
-        self.chat_log.see("end")
+        self.show_reply(response)
 
 if __name__ == "__main__":
     import argparse
@@ -320,9 +933,73 @@ if __name__ == "__main__":
         "--interval",
         type=float,
         default=CAPTURE_INTERVAL,
-        help="Screen capture interval in seconds",
+        help="Starting screen capture interval in seconds",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        default=MIN_CAPTURE_INTERVAL,
+        help="Shortest capture interval while the screen changes or you chat",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=MAX_CAPTURE_INTERVAL,
+        help="Longest capture interval on an idle screen",
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        default=CPU_BUDGET,
+        help="CPU use (percent of one core) the live vision may take",
+    )
+    parser.add_argument(
+        "--layout",
+        default=None,
+        help="Layout profile name for region OCR (default: pick by window size)",
+    )
+    parser.add_argument(
+        "--profile-log",
+        default=None,
+        help="Append per-stage timing snapshots to this JSON lines file",
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        help="Record every captured frame to this file for later replay",
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        help="Analyze a recording made with --record instead of the live screen",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay speed (1 = original timing, 0 = as fast as possible)",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print import and initialization times once everything is loaded, then exit",
     )
     args = parser.parse_args()
 
-    app = BambuAIAssistant(capture_interval=args.interval)
-    app.mainloop()
+    app = BambuAIAssistant(
+        capture_interval=args.interval,
+        layout_name=args.layout,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        cpu_budget=args.cpu_budget,
+        profile_log=args.profile_log,
+        record_path=args.record,
+        replay_path=args.replay,
+        replay_speed=args.replay_speed,
+        profile_startup=args.profile_startup,
+    )
+    app.mainloop()
+    if app.recorder is not None:
+        # The capture thread writes to the recording, so let it exit first
+        app.pipeline.stop(wait=True)
+        app.recorder.close()
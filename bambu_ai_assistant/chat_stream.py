@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import threading
+
+from profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+# Seconds between batched token updates handed to the UI
+FLUSH_INTERVAL = 0.03
+
+_DONE = object()
+
+
+class ChatStream:
+    """Stream chat replies on a background asyncio loop, in batched updates
+
+    Each reply runs as one task on the loop. The blocking HTTP stream of the
+    ChatAPIClient is read in the loop's executor and its tokens are coalesced
+    so on_batch(text) is called at most once per flush_interval (the first
+    token is passed on at once). Starting a new reply or calling cancel()
+    stops the one in flight: nothing more of it is delivered and its
+    connection is closed at once, even while the server is stalled.
+
+    Callbacks run on the loop thread; a UI must hand them to its own thread.
+    """
+
+    def __init__(self, client, flush_interval=FLUSH_INTERVAL):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="chat-stream", daemon=True)
+        self.thread.start()
+        self.future = None
+        self.stop = None
+
+    def start(self, prompt, on_batch, on_done, screen=None):
+        """Stream a reply to a prompt, cancelling any reply still in flight
+
+        on_done(error) is called once the reply ends, with None on success.
+        It is not called for a reply that was cancelled.
+        """
+        self.cancel()
+        self.stop = threading.Event()
+        self.future = asyncio.run_coroutine_threadsafe(self.stream(prompt, screen, on_batch, on_done, self.stop),
+                                                       self.loop)
+        return self.future
+
+    def cancel(self):
+        """Stop the reply in flight, if any; returns whether there was one"""
+        if self.future is None or self.future.done():
+            return False
+        # Cancel the task before the producer can hand it a last item, then
+        # free the producer, which may be blocked on a read
+        self.future.cancel()
+        self.stop.set()
+        self.client.cancel()
+        profiler.count("chat.cancelled")
+        return True
+
+    def close(self):
+        self.cancel()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def stream(self, prompt, screen, on_batch, on_done, stop):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def produce():
+            try:
+                for chunk in self.client.send(prompt, screen=screen, cancel=stop):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        loop.run_in_executor(None, produce)
+        batch = []
+        last_flush = -self.flush_interval
+
+        def flush():
+            nonlocal last_flush
+            on_batch("".join(batch))
+            batch.clear()
+            last_flush = loop.time()
+            profiler.count("chat.batches")
+
+        try:
+            while True:
+                if batch:
+                    wait = last_flush + self.flush_interval - loop.time()
+                    if wait <= 0:
+                        flush()
+                        continue
+                    try:
+                        item = await asyncio.wait_for(queue.get(), wait)
+                    except asyncio.TimeoutError:
+                        continue
+                else:
+                    item = await queue.get()
+
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                batch.append(item)
+        except Exception as e:
+            logger.warning(f"Chat stream failed: {e}")
+            if batch:
+                flush()
+            on_done(e)
+            return
+        finally:
+            # Tells the producer to drop the connection at its next chunk
+            stop.set()
+
+        if batch:
+            flush()
+        on_done(None)
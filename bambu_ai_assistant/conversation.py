@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from profiling import profiler
+
+# Prompt tokens (estimated) the history and screen context may use
+CONTEXT_BUDGET = 1200
+
+# Evicted turns are kept as one short line each, at most this many
+SUMMARY_TURNS = 8
+SUMMARY_CHARS = 120
+
+SYSTEM_PROMPT = ("You help operate Bambu Studio and Bambu Lab 3D printers. "
+                 "Screen lines describe what is on the user's screen; "
+                 "'Screen changed' lists only what changed since the last one.")
+
+# Emoji and other decoration in front of an analysis line
+LINE_PREFIX = re.compile(r"^[^\w]+")
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters each) without a tokenizer"""
+    return len(text) // 4 + 1
+
+
+def screen_fields(lines):
+    """Distil analysis lines into {field: value}
+
+    "🌡️ Nozzle: 215" becomes {"Nozzle": "215"}; a line without a value, such
+    as "🟢 Green indicators detected (possibly ready/good status)", becomes a
+    flag {"Green indicators detected": ""}.
+    """
+    fields = {}
+    for line in lines or []:
+        line = LINE_PREFIX.sub("", line).strip()
+        name, sep, value = line.partition(": ")
+        if sep:
+            fields[name] = value.strip()
+        else:
+            fields[re.sub(r"\s*\(.*?\)", "", line)] = ""
+    return fields
+
+
+def format_fields(fields):
+    return "; ".join(f"{name}={value}" if value else name for name, value in fields.items())
+
+
+def screen_delta(old, new):
+    """Compact text of the fields that changed between two screen states, or None"""
+    changed = {name: value for name, value in new.items() if old.get(name) != value}
+    gone = [name for name in old if name not in new]
+    parts = []
+    if changed:
+        parts.append(format_fields(changed))
+    if gone:
+        parts.append("gone: " + ", ".join(gone))
+    return "; ".join(parts) or None
+
+
+class Conversation:
+    """Chat history with compact screen context, kept under a token budget
+
+    Every user message carries only the screen fields that changed since the
+    previous turn. When the prompt would exceed the budget, the oldest turns
+    are evicted: their screen changes are folded into a baseline state and
+    each leaves a one-line summary, both sent in the system message.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or int(os.getenv("BAMBU_CHAT_BUDGET", CONTEXT_BUDGET))
+        self.lock = threading.Lock()
+        self.turns = []
+        self.summary = []
+        self.baseline = {}
+        self.fields = {}
+
+    def user_content(self, question, delta):
+        return f"[Screen changed: {delta}]\n{question}" if delta else question
+
+    def system_content(self):
+        parts = [SYSTEM_PROMPT]
+        if self.baseline:
+            parts.append("Screen before the turns below: " + format_fields(self.baseline))
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+        return "\n".join(parts)
+
+    def messages(self, question, screen=None):
+        """Chat messages for a new question asked while `screen` is shown"""
+        with self.lock:
+            fields = self.fields if screen is None else screen_fields(screen)
+            messages = [{"role": "system", "content": self.system_content()}]
+            for turn in self.turns:
+                messages.append({"role": "user", "content": self.user_content(turn['question'], turn['delta'])})
+                messages.append({"role": "assistant", "content": turn['answer']})
+            messages.append({"role": "user",
+                             "content": self.user_content(question, screen_delta(self.fields, fields))})
+        profiler.count("chat.prompt_tokens", sum(estimate_tokens(m['content']) for m in messages))
+        return messages
+
+    def add_turn(self, question, screen, answer):
+        """Record a completed answer, evicting old turns to stay in budget"""
+        with self.lock:
+            fields = self.fields if screen is None else screen_fields(screen)
+            self.turns.append({
+                'question': question,
+                'answer': answer,
+                'delta': screen_delta(self.fields, fields),
+                'fields': fields,
+            })
+            self.fields = fields
+            self.evict()
+
+    def history_key(self):
+        """Digest of the history a new question would be sent with"""
+        with self.lock:
+            data = json.dumps([self.summary, self.baseline, self.fields,
+                               [[turn['question'], turn['delta'], turn['answer']] for turn in self.turns]])
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def tokens(self):
+        total = estimate_tokens(self.system_content())
+        for turn in self.turns:
+            total += estimate_tokens(self.user_content(turn['question'], turn['delta']))
+            total += estimate_tokens(turn['answer'])
+        return total
+
+    def evict(self):
+        # The newest turn always stays; the new question still needs room
+        while len(self.turns) > 1 and self.tokens() > self.budget:
+            turn = self.turns.pop(0)
+            self.baseline = turn['fields']
+            answer = " ".join(turn['answer'].split())
+            if len(answer) > SUMMARY_CHARS:
+                answer = answer[:SUMMARY_CHARS - 3] + "..."
+            self.summary.append(f"Q: {turn['question']} A: {answer}")
+            del self.summary[:-SUMMARY_TURNS]
+            profiler.count("chat.turns_evicted")
+
+    def clear(self):
+        with self.lock:
+            self.turns = []
+            self.summary = []
+            self.baseline = {}
+            self.fields = {}
@@ -0,0 +1,76 @@
+from profiling import profiler
+
+# Frame-level inputs a detector can declare; anything else must be the output
+# of another registered detector
+RESOURCES = ('gray', 'hsv', 'edges', 'ocr')
+
+
+class Detector:
+    """A registered detector and what it reads and produces"""
+
+    def __init__(self, name, func, inputs=(), outputs=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs or (name,))
+
+
+class DetectorScheduler:
+    """Run only the detectors (and their dependencies) needed for a request
+
+    Each detector is called as func(frame, results) where results holds the
+    outputs computed so far. A detector with one output returns its value; one
+    with several returns a dict keyed by output name.
+    """
+
+    def __init__(self):
+        self.detectors = {}
+        self.producers = {}
+
+    def register(self, name, func, inputs=(), outputs=None):
+        detector = Detector(name, func, inputs, outputs)
+        for resource in detector.inputs:
+            if resource not in RESOURCES and resource not in self.producers:
+                raise ValueError(f"{name} depends on unknown output {resource!r}")
+        self.detectors[name] = detector
+        for output in detector.outputs:
+            self.producers[output] = detector
+        return detector
+
+    def plan(self, outputs):
+        """Detectors needed for the outputs, dependencies first"""
+        ordered = []
+        seen = set()
+
+        def visit(output):
+            detector = self.producers.get(output)
+            if detector is None:
+                raise KeyError(f"No detector produces {output!r}")
+            if detector.name in seen:
+                return
+            seen.add(detector.name)
+            for dependency in detector.inputs:
+                if dependency not in RESOURCES:
+                    visit(dependency)
+            ordered.append(detector)
+
+        for output in outputs:
+            visit(output)
+        return ordered
+
+    def resources(self, outputs):
+        """Frame-level inputs (gray, HSV, edges, OCR) a request will touch"""
+        return {resource for detector in self.plan(outputs)
+                for resource in detector.inputs if resource in RESOURCES}
+
+    def run(self, frame, outputs):
+        """Compute the requested outputs (plus dependencies) for one frame"""
+        results = {}
+        for detector in self.plan(outputs):
+            with profiler.stage(f"detector.{detector.name}"):
+                value = detector.func(frame, results)
+            if len(detector.outputs) == 1:
+                results[detector.outputs[0]] = value
+            else:
+                results.update({output: value.get(output) for output in detector.outputs})
+        return results
@@ -0,0 +1,208 @@
+import atexit
+import json
+import logging
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+# Characters a numeric readout can contain
+CHARSET = "0123456789.%/°C"
+
+# Glyphs are compared as GLYPH_SIZE bitmaps plus their shape and place on the line
+GLYPH_SIZE = (8, 12)
+SHAPE_WEIGHT = 4.0
+
+# A match must be this close (mean squared feature distance) and clearly
+# closer than the nearest sample of any other character
+MAX_DISTANCE = 0.04
+MAX_RATIO = 0.5
+
+# Samples kept per character, and how close a new one may be to an old one
+MAX_SAMPLES = 24
+DUPLICATE_DISTANCE = 0.002
+
+
+def segment_glyphs(gray):
+    """Split a one-line readout into glyph bitmaps, left to right
+
+    Returns a list of (bitmap, rect) with text pixels set, or None when the
+    crop does not look like a single line of separate glyphs.
+    """
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+    if gray.size == 0 or int(gray.max()) - int(gray.min()) < 40:
+        return None
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Text is the minority of the pixels
+    if np.count_nonzero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    stats = stats[1:]
+    boxes = sorted(stats[stats[:, cv2.CC_STAT_AREA] >= 2, :4].tolist())
+    if not boxes:
+        return None
+
+    # Parts of one glyph (the circles of %, a broken stroke) overlap horizontally
+    merged = [boxes[0]]
+    for x, y, w, h in boxes[1:]:
+        last = merged[-1]
+        overlap = min(last[0] + last[2], x + w) - max(last[0], x)
+        if overlap > 0.5 * min(last[2], w):
+            x2, y2 = max(last[0] + last[2], x + w), max(last[1] + last[3], y + h)
+            last[0], last[1] = min(last[0], x), min(last[1], y)
+            last[2], last[3] = x2 - last[0], y2 - last[1]
+        else:
+            merged.append([x, y, w, h])
+
+    # Touching glyphs would come out too wide to classify
+    line_height = max(box[3] for box in merged)
+    if any(w > line_height * 1.2 for _, _, w, _ in merged):
+        return None
+
+    return [(binary[y:y + h, x:x + w], (x, y, w, h)) for x, y, w, h in merged]
+
+
+def glyph_features(glyphs):
+    """Feature vectors (one row per glyph) for segmented glyphs"""
+    top = min(rect[1] for _, rect in glyphs)
+    bottom = max(rect[1] + rect[3] for _, rect in glyphs)
+    line_height = max(bottom - top, 1)
+
+    features = np.empty((len(glyphs), GLYPH_SIZE[0] * GLYPH_SIZE[1] + 3), dtype=np.float32)
+    for i, (bitmap, _) in enumerate(glyphs):
+        features[i, :-3] = cv2.resize(bitmap, GLYPH_SIZE, interpolation=cv2.INTER_AREA).ravel()
+    features[:, :-3] *= 1 / 255.0
+
+    # Without these a period, a degree sign and a zero all scale to a blob
+    rects = np.array([rect for _, rect in glyphs], dtype=np.float32)
+    features[:, -3] = np.minimum(rects[:, 2] / rects[:, 3], 2.0) / 2.0
+    features[:, -2] = rects[:, 3] / line_height
+    features[:, -1] = (rects[:, 1] - top) / line_height
+    features[:, -3:] *= SHAPE_WEIGHT
+    return features
+
+
+class DigitReader:
+    """Nearest-neighbour reader for numeric readouts in the Bambu Studio UI font
+
+    Glyphs are learned from readouts whose text is known (usually Tesseract
+    results for regions the reader could not read yet). read() returns None
+    for anything it does not recognize with confidence, so callers can fall
+    back to Tesseract and teach the reader with learn().
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.features = np.zeros((0, GLYPH_SIZE[0] * GLYPH_SIZE[1] + 3), dtype=np.float32)
+        self.labels = []
+        self.codes = np.zeros(0, dtype=np.int64)
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @profiler.timed("ocr.digits")
+    def read(self, gray):
+        """Text of a numeric readout crop, or None when unsure"""
+        if not self.labels:
+            return None
+        glyphs = segment_glyphs(gray)
+        if not glyphs:
+            return None
+
+        features = glyph_features(glyphs)
+        with self.lock:
+            known, labels, codes = self.features, self.labels, self.codes
+        distances = ((features[:, None, :] - known[None, :, :]) ** 2).mean(axis=2)
+        nearest = distances.argmin(axis=1)
+        best = distances[np.arange(len(nearest)), nearest]
+        other = np.where(codes[None, :] == codes[nearest][:, None], np.inf, distances).min(axis=1)
+        if best.max() > MAX_DISTANCE or (best > MAX_RATIO * other).any():
+            profiler.count("ocr.digits_unsure")
+            return None
+        profiler.count("ocr.digits_read")
+        return "".join(labels[i] for i in nearest)
+
+    def learn(self, gray, text):
+        """Add the glyphs of a crop whose text is known; returns the number added"""
+        chars = [c for c in (text or "") if not c.isspace()]
+        if not chars or any(c not in CHARSET for c in chars):
+            return 0
+        glyphs = segment_glyphs(gray)
+        if not glyphs or len(glyphs) != len(chars):
+            return 0
+
+        added = 0
+        with self.lock:
+            for feature, char in zip(glyph_features(glyphs), chars):
+                same = [i for i, label in enumerate(self.labels) if label == char]
+                if same:
+                    nearest = ((self.features[same] - feature) ** 2).mean(axis=1).min()
+                    if nearest < DUPLICATE_DISTANCE or len(same) >= MAX_SAMPLES:
+                        continue
+                self.features = np.vstack([self.features, feature])
+                self.labels = self.labels + [char]
+                self.codes = np.append(self.codes, CHARSET.index(char))
+                added += 1
+        return added
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            features = np.array(data['features'], dtype=np.float32)
+            if features.size and features.shape[1] != self.features.shape[1]:
+                raise ValueError("glyph size changed")
+            labels = list(data['labels'])
+            codes = np.array([CHARSET.index(label) for label in labels], dtype=np.int64)
+            with self.lock:
+                self.features = features.reshape(-1, self.features.shape[1])
+                self.labels = labels
+                self.codes = codes
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load digit glyphs from {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with self.lock:
+                data = {'labels': self.labels, 'features': self.features.round(3).tolist()}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save digit glyphs to {self.path}: {e}")
+
+
+_default_reader = None
+_default_lock = threading.Lock()
+
+
+def get_digit_reader():
+    """Return the shared digit reader, persisted to BAMBU_DIGIT_GLYPHS when set
+
+    BAMBU_DIGIT_READER=0 turns it off (every readout goes to Tesseract).
+    """
+    global _default_reader
+    if os.getenv("BAMBU_DIGIT_READER", "1") == "0":
+        return None
+    with _default_lock:
+        if _default_reader is None:
+            _default_reader = DigitReader(path=os.getenv("BAMBU_DIGIT_GLYPHS"))
+        return _default_reader
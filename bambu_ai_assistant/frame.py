@@ -0,0 +1,180 @@
+import time
+
+import cv2
+import numpy as np
+
+from profiling import profiler
+from blob_analysis import blob_stats
+
+# Converting from each supported channel order
+TO_GRAY = {'RGB': cv2.COLOR_RGB2GRAY, 'BGR': cv2.COLOR_BGR2GRAY, 'BGRA': cv2.COLOR_BGRA2GRAY}
+TO_HSV = {'RGB': cv2.COLOR_RGB2HSV, 'BGR': cv2.COLOR_BGR2HSV}
+TO_RGB = {'BGR': cv2.COLOR_BGR2RGB, 'BGRA': cv2.COLOR_BGRA2RGB}
+
+# Profiler stage of each cached value that is not a color conversion
+STAGES = {'edges': 'canny', 'edge_blobs': 'blobs.edges', 'proposed_edge_blobs': 'blobs.proposed'}
+
+# Outlines whose bounding box is smaller than this are not proposed for refinement
+PROPOSAL_MIN_AREA = 1000
+
+
+class Frame:
+    """A captured image plus lazily computed, cached color conversions
+
+    Pixels are kept in the order they were captured in (BGRA for screen
+    grabs), so detectors that only need gray or HSV never pay for a full
+    conversion to RGB.
+    """
+
+    def __init__(self, pixels, order='RGB', timestamp=None, origin=(0, 0), window=False):
+        self.pixels = pixels
+        self.order = order
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.origin = origin
+        self.window = window
+        self._cache = {}
+
+    @property
+    def shape(self):
+        return self.pixels.shape
+
+    @property
+    def size(self):
+        return self.pixels.size
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    def _cached(self, key, compute):
+        value = self._cache.get(key)
+        if value is None:
+            # Conversions, Canny edges and pyramid levels are profiled per kind
+            stage = 'pyramid' if isinstance(key, tuple) else STAGES.get(key, f"convert.{key}")
+            with profiler.stage(stage):
+                value = self._cache[key] = compute()
+        return value
+
+    @property
+    def bgr(self):
+        """BGR pixels; a zero-copy (non-contiguous) view for BGRA frames"""
+        if self.order == 'BGRA':
+            return self.pixels[:, :, :3]
+        if self.order == 'BGR':
+            return self.pixels
+        return self._cached('bgr', lambda: cv2.cvtColor(self.pixels, cv2.COLOR_RGB2BGR))
+
+    @property
+    def rgb(self):
+        if self.order == 'RGB':
+            return self.pixels
+        return self._cached('rgb', lambda: cv2.cvtColor(self.pixels, TO_RGB[self.order]))
+
+    @property
+    def gray(self):
+        if self.pixels.ndim == 2:
+            return self.pixels
+        return self._cached('gray', lambda: cv2.cvtColor(self.pixels, TO_GRAY[self.order]))
+
+    @property
+    def hsv(self):
+        def compute():
+            if self.order == 'BGRA':
+                return cv2.cvtColor(np.ascontiguousarray(self.bgr), cv2.COLOR_BGR2HSV)
+            return cv2.cvtColor(self.pixels, TO_HSV[self.order])
+        return self._cached('hsv', compute)
+
+    @property
+    def edges(self):
+        """Canny edges of the gray image with the thresholds used across the app"""
+        return self._cached('edges', lambda: cv2.Canny(self.gray, 50, 150))
+
+    @property
+    def edge_blobs(self):
+        """Blob statistics of the edges, shared by the outline-based detectors"""
+        return self._cached('edge_blobs', lambda: blob_stats(self.edges))
+
+    @property
+    def proposed_edge_blobs(self):
+        """Full-resolution edge blobs, with Canny run only where a coarse level sees outlines
+
+        The pyramid level used for detection proposes outlines with halved
+        Canny thresholds (downsampling softens edges). Each proposal with a
+        bounding box of at least PROPOSAL_MIN_AREA is re-detected at full
+        resolution, with a margin. For outlines that size the result is the
+        same as edge_blobs.
+        """
+        return self._cached('proposed_edge_blobs', self._proposed_edge_blobs)
+
+    def _proposed_edge_blobs(self):
+        level = self.pyramid_level()
+        if level == 0:
+            return self.edge_blobs
+        scale = 1 << level
+        margin = 2 * scale + 2
+        proposals = blob_stats(cv2.Canny(self.level(level).gray, 25, 75)).scaled(scale)
+        proposals = proposals[(proposals.width + 2 * margin) * (proposals.height + 2 * margin) >= PROPOSAL_MIN_AREA]
+
+        edges = np.zeros(self.shape[:2], dtype=np.uint8)
+        gray = self.gray
+        pad = 8  # Canny runs a little past each box so its border does not add edges
+        for i in range(len(proposals)):
+            x, y, w, h = proposals[i]
+            x1, y1 = max(0, x - margin), max(0, y - margin)
+            x2, y2 = min(self.width, x + w + margin), min(self.height, y + h + margin)
+            px1, py1 = max(0, x1 - pad), max(0, y1 - pad)
+            px2, py2 = min(self.width, x2 + pad), min(self.height, y2 + pad)
+            crop_edges = cv2.Canny(gray[py1:py2, px1:px2], 50, 150)
+            box = edges[y1:y2, x1:x2]
+            np.maximum(box, crop_edges[y1 - py1:y2 - py1, x1 - px1:x2 - px1], out=box)
+        return blob_stats(edges)
+
+    def level(self, n):
+        """Pyramid level n of this frame (each level halves both sides), cached"""
+        if n <= 0:
+            return self
+
+        def compute():
+            below = self.level(n - 1)
+            return Frame(cv2.pyrDown(below.pixels), self.order, self.timestamp, self.origin, self.window)
+        return self._cached(('level', n), compute)
+
+    def pyramid_level(self, max_side=1280):
+        """Smallest pyramid level whose longer side fits in max_side"""
+        n = 0
+        side = max(self.height, self.width)
+        while side > max_side:
+            side //= 2
+            n += 1
+        return n
+
+    def crop(self, x, y, w, h):
+        """Return a Frame viewing part of this one, sharing pixel memory"""
+        return Frame(self.pixels[y:y + h, x:x + w], self.order, self.timestamp,
+                     (self.origin[0] + x, self.origin[1] + y), self.window)
+
+    def thumbnail(self, max_width, max_height):
+        """Downscale first, then convert only the small image to RGB"""
+        scale = min(max_width / self.width, max_height / self.height, 1.0)
+        size = (max(1, int(self.width * scale)), max(1, int(self.height * scale)))
+        small = cv2.resize(self.pixels, size, interpolation=cv2.INTER_AREA)
+        if self.order == 'RGB' or small.ndim == 2:
+            return small
+        return cv2.cvtColor(small, TO_RGB[self.order])
+
+
+def upscale_rect(rect, level):
+    """Map an (x, y, w, h) rect found at a pyramid level back to full resolution"""
+    scale = 1 << level
+    return tuple(int(v) * scale for v in rect)
+
+
+def as_frame(image):
+    """Wrap a plain RGB array (as used by the older helpers) in a Frame"""
+    if isinstance(image, Frame):
+        return image
+    return Frame(image, 'RGB')
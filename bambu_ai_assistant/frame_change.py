@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+
+
+class FrameChange:
+    """Result of comparing a frame with the previous one"""
+
+    def __init__(self, changed, dirty_tiles, changed_fraction):
+        self.changed = changed
+        self.dirty_tiles = dirty_tiles
+        self.changed_fraction = changed_fraction
+
+    @property
+    def partial(self):
+        return self.changed and self.changed_fraction < 1.0
+
+    def __repr__(self):
+        return f"FrameChange(changed={self.changed}, dirty={len(self.dirty_tiles)}, fraction={self.changed_fraction:.2f})"
+
+
+class FrameChangeDetector:
+    """Cheap tile-wise change detector on a downsampled grayscale frame"""
+
+    def __init__(self, grid=(4, 4), sample_width=320, threshold=12):
+        self.rows, self.cols = grid
+        self.sample_width = sample_width
+        self.threshold = threshold
+        self.previous = None
+        self.previous_shape = None
+
+    def reset(self):
+        self.previous = None
+        self.previous_shape = None
+
+    def tiles(self, shape):
+        """Return {(row, col): (x, y, w, h)} for a full-resolution frame shape"""
+        height, width = shape[:2]
+        xs = np.linspace(0, width, self.cols + 1).astype(int).tolist()
+        ys = np.linspace(0, height, self.rows + 1).astype(int).tolist()
+        return {
+            (r, c): (xs[c], ys[r], xs[c + 1] - xs[c], ys[r + 1] - ys[r])
+            for r in range(self.rows)
+            for c in range(self.cols)
+        }
+
+    def downsample(self, image):
+        """Area-average the frame to a small grayscale thumbnail aligned to the grid"""
+        height, width = image.shape[:2]
+        sample_w = max(self.cols, self.sample_width - self.sample_width % self.cols)
+        sample_h = max(self.rows, int(round(sample_w * height / max(width, 1))))
+        sample_h -= sample_h % self.rows
+        sample_h = max(self.rows, sample_h)
+
+        small = cv2.resize(image, (sample_w, sample_h), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if small.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            small = cv2.cvtColor(small, code)
+        return small
+
+    def update(self, image):
+        """Compare a frame with the previous one and remember it"""
+        small = self.downsample(image)
+        all_tiles = [(r, c) for r in range(self.rows) for c in range(self.cols)]
+
+        if self.previous is None or self.previous_shape != image.shape[:2] or self.previous.shape != small.shape:
+            self.previous = small
+            self.previous_shape = image.shape[:2]
+            return FrameChange(True, all_tiles, 1.0)
+
+        if np.array_equal(small, self.previous):
+            return FrameChange(False, [], 0.0)
+
+        diff = cv2.absdiff(small, self.previous)
+        tile_h = small.shape[0] // self.rows
+        tile_w = small.shape[1] // self.cols
+        tile_max = diff.reshape(self.rows, tile_h, self.cols, tile_w).max(axis=(1, 3))
+
+        dirty = [(int(r), int(c)) for r, c in zip(*np.nonzero(tile_max > self.threshold))]
+        # Only refresh the reference for dirty tiles so slow drifts still add up
+        for r, c in dirty:
+            rows = slice(r * tile_h, (r + 1) * tile_h)
+            cols = slice(c * tile_w, (c + 1) * tile_w)
+            self.previous[rows, cols] = small[rows, cols]
+
+        return FrameChange(bool(dirty), dirty, len(dirty) / len(all_tiles))
+
+
+def boxes_intersect(a, b):
+    """Check whether two (x, y, w, h) boxes overlap"""
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def merge_dirty_tiles(first, second):
+    """Union of two dirty-tile lists, where None means the whole frame"""
+    if first is None or second is None:
+        return None
+    return sorted(set(first) | set(second))
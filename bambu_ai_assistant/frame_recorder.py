@@ -0,0 +1,292 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from frame import Frame
+
+logger = logging.getLogger(__name__)
+
+# File layout: header, zlib-compressed frame blobs, the index (a flat array of
+# INDEX_DTYPE records), then a footer pointing at the index. The index can be
+# memory-mapped directly; identical frames share one blob.
+MAGIC = b"BAMBUREC"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+FOOTER = struct.Struct("<QQ8s")
+
+ORDERS = ('RGB', 'BGR', 'BGRA', 'GRAY')
+
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u1'),
+    ('order', '<u1'),
+    ('window', '<u1'),
+    ('unique', '<u1'),
+    ('origin_x', '<i4'),
+    ('origin_y', '<i4'),
+])
+
+
+class FrameRecorder:
+    """Write captured Frames to a compact, deduplicated recording file"""
+
+    def __init__(self, path, level=1):
+        self.path = path
+        self.level = level
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, INDEX_DTYPE.itemsize))
+        self.index = []
+        self.blobs = {}
+        self.lock = threading.Lock()
+        self.bytes_in = 0
+
+    def write(self, frame):
+        """Append a frame; returns False when it duplicated an earlier one"""
+        pixels = np.ascontiguousarray(frame.pixels)
+        digest = (pixels.shape, hashlib.blake2b(pixels.data, digest_size=16).digest())
+        order = 'GRAY' if pixels.ndim == 2 else frame.order
+
+        with self.lock:
+            self.bytes_in += pixels.nbytes
+            blob = self.blobs.get(digest)
+            unique = blob is None
+            if unique:
+                data = zlib.compress(pixels.data, self.level)
+                blob = self.blobs[digest] = (self.file.tell(), len(data))
+                self.file.write(data)
+
+            self.index.append((
+                frame.timestamp, blob[0], blob[1], pixels.shape[0], pixels.shape[1],
+                1 if pixels.ndim == 2 else pixels.shape[2], ORDERS.index(order),
+                bool(frame.window), unique, frame.origin[0], frame.origin[1],
+            ))
+        return unique
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            index_offset = self.file.tell()
+            self.file.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+            self.file.write(FOOTER.pack(index_offset, len(self.index), MAGIC))
+            self.file.close()
+            size = os.path.getsize(self.path)
+        logger.info(f"Recorded {len(self.index)} frames ({len(self.blobs)} unique) to {self.path}: "
+                    f"{self.bytes_in / 1e6:.1f} MB -> {size / 1e6:.1f} MB")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """Read-only, memory-mapped view of a recording file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, itemsize = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or itemsize != INDEX_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a supported frame recording")
+        if len(self.data) < HEADER.size + FOOTER.size:
+            raise ValueError(f"{path} is incomplete (recording was not closed)")
+        index_offset, count, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is incomplete (recording was not closed)")
+        self.index = np.frombuffer(self.data, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        self._last = (None, None)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def duration(self):
+        if not len(self.index):
+            return 0.0
+        return float(self.index['timestamp'][-1] - self.index['timestamp'][0])
+
+    def frame(self, i):
+        """Decode frame i (deduplicated frames are decoded once in a row)"""
+        record = self.index[i]
+        offset, length = int(record['offset']), int(record['length'])
+        if self._last[0] == offset:
+            pixels = self._last[1]
+        else:
+            raw = zlib.decompress(self.data[offset:offset + length])
+            shape = (int(record['height']), int(record['width']))
+            if record['channels'] > 1:
+                shape += (int(record['channels']),)
+            pixels = np.frombuffer(raw, dtype=np.uint8).reshape(shape)
+            self._last = (offset, pixels)
+        return Frame(pixels, ORDERS[record['order']], float(record['timestamp']),
+                     (int(record['origin_x']), int(record['origin_y'])), bool(record['window']))
+
+    def close(self):
+        # The index is a view of the map, so drop it first
+        self.index = None
+        self._last = (None, None)
+        self.data.close()
+        self.file.close()
+
+
+class ReplaySource:
+    """Plays a recording back through the ScreenGrabber interface
+
+    speed=1 keeps the original frame timing, 2 plays twice as fast and 0 plays
+    as fast as frames are requested. grab() returns None once the recording
+    is over (unless loop is set).
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.recording = Recording(path)
+        self.speed = speed
+        self.loop = loop
+        self.position = 0
+        self.finished = False
+        self.started = None
+        self.lock = threading.Lock()
+
+    def set_window(self, window):
+        pass
+
+    def grab(self):
+        with self.lock:
+            if self.position >= len(self.recording):
+                if not self.loop or not len(self.recording):
+                    self.finished = True
+                    return None
+                self.position = 0
+                self.started = None
+            frame = self.recording.frame(self.position)
+            first = float(self.recording.index['timestamp'][0])
+            self.position += 1
+
+            if self.speed and self.speed > 0:
+                now = time.monotonic()
+                if self.started is None:
+                    self.started = now
+                delay = self.started + (frame.timestamp - first) / self.speed - now
+                if delay > 0:
+                    time.sleep(delay)
+            return frame
+
+    def close(self):
+        self.recording.close()
+
+
+def record_screen(path, seconds, interval=0.5, window=None):
+    """Record the screen (or a window) for a number of seconds"""
+    from screen_grabber import ScreenGrabber
+
+    grabber = ScreenGrabber(window)
+    end = time.monotonic() + seconds
+    with FrameRecorder(path) as recorder:
+        while time.monotonic() < end:
+            recorder.write(grabber.grab())
+            time.sleep(interval)
+    grabber.close()
+
+
+def replay_benchmark(path, speed=0.0, workers=2):
+    """Run a recording through the vision pipeline headless and return its stats"""
+    from advanced_vision import AdvancedBambuVision
+    from vision_pipeline import VisionPipeline
+    from profiling import profiler
+
+    source = ReplaySource(path, speed=speed)
+    vision = AdvancedBambuVision()
+    done = threading.Event()
+    captured = []
+    analyzed = []
+
+    def capture():
+        if done.is_set():
+            return None
+        # At full speed wait for a free slot so every frame gets analyzed
+        while not speed and len(pipeline.frames) >= pipeline.frames.maxsize:
+            time.sleep(0.001)
+        frame = source.grab()
+        if frame is None:
+            done.set()
+            return None
+        captured.append(frame.timestamp)
+        return frame, None
+
+    def analyze(item):
+        try:
+            return vision.generate_detailed_report(item.image)
+        finally:
+            analyzed.append(item.seq)
+
+    pipeline = VisionPipeline(capture, analyze, lambda item: pipeline.mark_displayed(item),
+                              interval=0.0, workers=workers)
+    started = time.monotonic()
+    pipeline.start()
+    done.wait()
+    # Let the workers finish every frame still queued or in flight
+    deadline = time.monotonic() + 30
+    while len(analyzed) + pipeline.frames.dropped < len(captured) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - started
+    pipeline.stop()
+    source.close()
+
+    stats = pipeline.stats(window=elapsed + 1)
+    stats.update(frames=len(captured), analyzed=len(analyzed), seconds=elapsed,
+                 throughput_fps=len(analyzed) / elapsed if elapsed > 0 else 0.0)
+    return stats, profiler.format_table()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record or replay Bambu Studio frame streams")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Record the screen")
+    record.add_argument("path")
+    record.add_argument("--seconds", type=float, default=60.0)
+    record.add_argument("--interval", type=float, default=0.5)
+
+    info = commands.add_parser("info", help="Describe a recording")
+    info.add_argument("path")
+
+    replay = commands.add_parser("replay", help="Run a recording through the vision pipeline")
+    replay.add_argument("path")
+    replay.add_argument("--speed", type=float, default=0.0, help="1 = original timing, 0 = as fast as possible")
+    replay.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "record":
+        record_screen(args.path, args.seconds, args.interval)
+    elif args.command == "info":
+        recording = Recording(args.path)
+        unique = int(recording.index['unique'].sum())
+        print(f"{len(recording)} frames ({unique} unique) over {recording.duration:.1f}s, "
+              f"{os.path.getsize(args.path) / 1e6:.1f} MB")
+        recording.close()
+    else:
+        stats, table = replay_benchmark(args.path, speed=args.speed, workers=args.workers)
+        print(f"Analyzed {stats['analyzed']}/{stats['frames']} frames in {stats['seconds']:.1f}s "
+              f"({stats['throughput_fps']:.1f} fps, {stats['dropped_frames']} dropped, "
+              f"latency {stats['latency_ms']:.0f} ms avg / {stats['max_latency_ms']:.0f} ms max)")
+        print(table)
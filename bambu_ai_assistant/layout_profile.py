@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import re
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Regions are stored as fractions of the Bambu Studio window (x, y, w, h) so a
+# profile keeps working when the window is resized. Override or extend them
+# with a JSON file pointed to by BAMBU_LAYOUT_PROFILES.
+BUILTIN_PROFILES = {
+    "bambu-studio-default": {
+        "studio_version": "*",
+        "reference_size": (1920, 1080),
+        "regions": {
+            "file_name": {"box": (0.30, 0.000, 0.40, 0.030), "kind": "text", "scale": 1.5},
+            "nozzle_temp": {"box": (0.805, 0.150, 0.085, 0.035), "kind": "temperature", "scale": 3.0, "binarize": True},
+            "bed_temp": {"box": (0.805, 0.190, 0.085, 0.035), "kind": "temperature", "scale": 3.0, "binarize": True},
+            "print_progress": {"box": (0.600, 0.060, 0.080, 0.035), "kind": "percent", "scale": 3.0, "binarize": True},
+            "print_time": {"box": (0.680, 0.060, 0.120, 0.035), "kind": "text", "scale": 2.0, "binarize": True},
+            "layer_height": {"box": (0.000, 0.300, 0.180, 0.035), "kind": "text", "scale": 2.0, "binarize": True},
+            "filament": {"box": (0.000, 0.160, 0.180, 0.040), "kind": "text", "scale": 2.0},
+        },
+    },
+    "bambu-studio-compact": {
+        "studio_version": "*",
+        "reference_size": (1366, 768),
+        "regions": {
+            "file_name": {"box": (0.25, 0.000, 0.50, 0.035), "kind": "text", "scale": 2.0},
+            "nozzle_temp": {"box": (0.760, 0.170, 0.110, 0.045), "kind": "temperature", "scale": 4.0, "binarize": True},
+            "bed_temp": {"box": (0.760, 0.220, 0.110, 0.045), "kind": "temperature", "scale": 4.0, "binarize": True},
+            "print_progress": {"box": (0.560, 0.065, 0.100, 0.045), "kind": "percent", "scale": 4.0, "binarize": True},
+            "print_time": {"box": (0.660, 0.065, 0.150, 0.045), "kind": "text", "scale": 3.0, "binarize": True},
+            "layer_height": {"box": (0.000, 0.320, 0.220, 0.045), "kind": "text", "scale": 3.0, "binarize": True},
+            "filament": {"box": (0.000, 0.170, 0.220, 0.050), "kind": "text", "scale": 3.0},
+        },
+    },
+}
+
+TESSERACT_CONFIGS = {
+    "temperature": "--psm 7 -c tessedit_char_whitelist=0123456789/°C.",
+    "percent": "--psm 7 -c tessedit_char_whitelist=0123456789%.",
+    "text": "--psm 7",
+}
+
+# Region kinds the digit reader handles before falling back to Tesseract
+DIGIT_KINDS = ("temperature", "percent")
+
+
+class LayoutProfile:
+    """Named screen regions of a Bambu Studio layout"""
+
+    def __init__(self, name, regions, studio_version="*", reference_size=(1920, 1080)):
+        self.name = name
+        self.regions = regions
+        self.studio_version = studio_version
+        self.reference_size = tuple(reference_size)
+
+    @classmethod
+    def from_dict(cls, name, data):
+        return cls(
+            name,
+            data.get("regions", {}),
+            studio_version=data.get("studio_version", "*"),
+            reference_size=data.get("reference_size", (1920, 1080)),
+        )
+
+    def region_names(self, kind=None):
+        """List region names, optionally filtered by kind"""
+        return [name for name, spec in self.regions.items()
+                if kind is None or spec.get("kind", "text") == kind]
+
+    def region_box(self, name, shape):
+        """Return the pixel box (x, y, w, h) of a region for an image shape"""
+        height, width = shape[:2]
+        rx, ry, rw, rh = self.regions[name]["box"]
+        x = int(round(rx * width))
+        y = int(round(ry * height))
+        w = int(round(rw * width))
+        h = int(round(rh * height))
+        x = min(max(x, 0), width)
+        y = min(max(y, 0), height)
+        return x, y, min(w, width - x), min(h, height - y)
+
+    def crop(self, image, name):
+        """Return a view of the image restricted to a region"""
+        x, y, w, h = self.region_box(name, image.shape)
+        return image[y:y + h, x:x + w]
+
+    def matches_version(self, version):
+        if not version or self.studio_version == "*":
+            return True
+        # Compared part by part, so a "1.1" profile does not match Studio 1.10
+        wanted = normalize_version(self.studio_version).split(".")
+        return normalize_version(version).split(".")[:len(wanted)] == wanted
+
+
+def normalize_version(version):
+    """Drop leading zeros from each part (01.09.07 becomes 1.9.7)"""
+    return ".".join(str(int(part)) if part.isdigit() else part for part in str(version).split("."))
+
+
+def studio_version_from_title(title):
+    """Bambu Studio version in a window title ("Bambu Studio V01.09.07.52"), or None"""
+    match = re.search(r"studio\D{0,3}?(\d+(?:\.\d+)+)", title or "", re.IGNORECASE)
+    return normalize_version(match.group(1)) if match else None
+
+
+def load_profiles(path=None):
+    """Load the built-in profiles plus any defined in a JSON file"""
+    profiles = {name: LayoutProfile.from_dict(name, data) for name, data in BUILTIN_PROFILES.items()}
+
+    path = path or os.getenv("BAMBU_LAYOUT_PROFILES")
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for name, spec in data.items():
+                profiles[name] = LayoutProfile.from_dict(name, spec)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load layout profiles from {path}: {e}")
+
+    return profiles
+
+
+def select_profile(width, height, version=None, profiles=None, name=None):
+    """Pick the profile closest to the given window size and Studio version"""
+    profiles = profiles or load_profiles()
+    if name:
+        return profiles.get(name)
+
+    candidates = [p for p in profiles.values() if p.matches_version(version)]
+    if not candidates:
+        return None
+
+    def distance(profile):
+        ref_w, ref_h = profile.reference_size
+        aspect = abs(width / max(height, 1) - ref_w / ref_h)
+        size = abs(np.log(max(width * height, 1) / (ref_w * ref_h)))
+        # Exact version matches win over wildcard profiles; without a version
+        # the wildcard profiles win
+        rank = 0 if (profile.studio_version != "*") == bool(version) else 1
+        return rank, aspect + size
+
+    return min(candidates, key=distance)
+
+
+def prepare_region(crop, scale=1.0, binarize=False):
+    """Grayscale, upscale and optionally binarize a crop for OCR"""
+    if crop.size == 0:
+        return crop
+
+    if len(crop.shape) == 3:
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    else:
+        gray = crop
+
+    if scale and scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+
+    if binarize:
+        _, gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Tesseract prefers dark text on a light background
+        if np.mean(gray) < 127:
+            gray = cv2.bitwise_not(gray)
+
+    return gray
+
+
+def read_regions(image, profile, names=None, kind=None, parallel=True):
+    """OCR the named regions of a profile and return {name: {text, box}}
+
+    Numeric regions are tried with the digit reader first; only what it
+    cannot read goes to Tesseract, and those results teach it. With
+    parallel=True the crops are recognized concurrently by the shared OCR
+    service; cached crops never leave this process.
+    """
+    from ocr_cache import cached_image_to_string
+    from ocr_service import get_ocr_service
+    from digit_reader import get_digit_reader
+
+    if names is None:
+        names = profile.region_names(kind)
+
+    reader = get_digit_reader()
+    results = {}
+    requests = []
+    for name in names:
+        spec = profile.regions[name]
+        box = profile.region_box(name, image.shape)
+        if box[2] <= 0 or box[3] <= 0:
+            continue
+
+        crop = profile.crop(image, name)
+        region_kind = spec.get("kind", "text")
+        if reader is not None and region_kind in DIGIT_KINDS:
+            text = reader.read(crop)
+            if text is not None:
+                results[name] = {"text": text, "box": box, "kind": region_kind}
+                continue
+
+        prepared = prepare_region(
+            crop,
+            scale=spec.get("scale", 1.0),
+            binarize=spec.get("binarize", False),
+        )
+        config = TESSERACT_CONFIGS.get(region_kind, TESSERACT_CONFIGS["text"])
+        requests.append((name, box, prepared, config, crop))
+
+    service = get_ocr_service() if parallel and len(requests) > 1 else None
+    if service is not None:
+        texts = service.image_to_string_batch([(crop, config) for _, _, crop, config, _ in requests])
+    else:
+        texts = []
+        for name, _, crop, config, _ in requests:
+            try:
+                texts.append(cached_image_to_string(crop, config=config))
+            except Exception as e:
+                logger.error(f"OCR error in region {name}: {e}")
+                texts.append(None)
+
+    for (name, box, _, _, crop), text in zip(requests, texts):
+        if text is None:
+            continue
+        kind = profile.regions[name].get("kind", "text")
+        results[name] = {"text": text.strip(), "box": box, "kind": kind}
+        if reader is not None and kind in DIGIT_KINDS and parse_number(text) is not None:
+            reader.learn(crop, text.strip())
+
+    return results
+
+
+def parse_number(text):
+    """Return the first number in an OCR string, or None"""
+    match = re.search(r"\d+(?:\.\d+)?", text or "")
+    if not match:
+        return None
+    value = float(match.group(0))
+    return int(value) if value.is_integer() else value
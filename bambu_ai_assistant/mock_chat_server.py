@@ -0,0 +1,180 @@
+"""Local stand-in for the OpenAI chat completion API, for offline testing
+
+Streams SSE chunks like the real API, at a configurable token rate with
+jitter, and can fail requests or stall mid-stream on purpose:
+
+    python mock_chat_server.py --port 8001 --rate 40 --jitter 0.3 --error-rate 0.1
+    OPENAI_API_KEY=test OPENAI_API_URL=http://127.0.0.1:8001/v1/chat/completions \\
+        python chat_gui.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words the stand-in answers with, cycled to the requested length
+REPLY_WORDS = ("The nozzle is heating to the target temperature and the bed is level, "
+               "so the print should start once both readouts are stable.").split()
+
+ERROR_STATUSES = (429, 500, 503)
+
+
+class MockChatConfig:
+    """How the stand-in behaves; may be changed while the server runs"""
+
+    def __init__(self, tokens=60, rate=50.0, jitter=0.2, first_token=0.2, error_rate=0.0,
+                 stall_rate=0.0, stall_seconds=5.0, seed=None):
+        self.tokens = tokens              # Tokens per answer
+        self.rate = rate                  # Tokens per second (0 = as fast as possible)
+        self.jitter = jitter              # Relative random variation of every delay
+        self.first_token = first_token    # Seconds before the first token
+        self.error_rate = error_rate      # Share of requests answered with 429/500/503
+        self.stall_rate = stall_rate      # Share of answers that stall part way
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def error_status(self):
+        """Status to fail a request with, or None to answer it"""
+        with self.lock:
+            if self.random.random() < self.error_rate:
+                return self.random.choice(ERROR_STATUSES)
+        return None
+
+    def stall_point(self):
+        """Token to stall before, or None to stream without stalling"""
+        with self.lock:
+            if self.random.random() < self.stall_rate:
+                return self.random.randrange(self.tokens)
+        return None
+
+    def delay(self, seconds):
+        if seconds <= 0:
+            return 0.0
+        with self.lock:
+            return max(0.0, seconds * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        config = self.server.config
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self.send_body(400, b'{"error": {"message": "invalid JSON"}}')
+        self.server.count("requests")
+
+        status = config.error_status()
+        if status is not None:
+            self.server.count("errors")
+            return self.send_body(status, b'{"error": {"message": "mock failure"}}', retry_after="0.05")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        model = request.get("model", "mock")
+        stall_at = config.stall_point()
+        try:
+            time.sleep(config.delay(config.first_token))
+            for i in range(config.tokens):
+                if i == stall_at:
+                    self.server.count("stalls")
+                    time.sleep(config.stall_seconds)
+                word = REPLY_WORDS[i % len(REPLY_WORDS)]
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+                self.send_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+                if config.rate > 0 and i + 1 < config.tokens:
+                    time.sleep(config.delay(1 / config.rate))
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.send_chunk(b"")
+        except OSError:
+            # The client hung up (cancelled or timed out)
+            self.server.count("disconnects")
+            self.close_connection = True
+
+    def send_body(self, status, body, retry_after=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if retry_after:
+            self.send_header("Retry-After", retry_after)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+class MockChatServer(ThreadingHTTPServer):
+    """Threaded stand-in server; start() serves in the background"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), MockChatHandler)
+        self.config = config or MockChatConfig()
+        self.counts = {}
+        self.counts_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="mock-chat-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the chat completion API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--tokens", type=int, default=60, help="Tokens per answer")
+    parser.add_argument("--rate", type=float, default=50.0, help="Tokens per second (0 = unthrottled)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative random variation of delays")
+    parser.add_argument("--first-token", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Share of answers that stall")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="Length of a stall")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = MockChatConfig(tokens=args.tokens, rate=args.rate, jitter=args.jitter,
+                            first_token=args.first_token, error_rate=args.error_rate,
+                            stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, seed=args.seed)
+    server = MockChatServer(args.host, args.port, config)
+    print(f"Mock chat API at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
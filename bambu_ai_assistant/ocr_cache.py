@@ -0,0 +1,194 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+DATA_FIELDS = ('text', 'left', 'top', 'width', 'height', 'conf', 'block_num', 'par_num', 'line_num')
+
+
+def perceptual_hash(image, factor=2):
+    """Hash an image region so identical-looking text maps to the same key
+
+    The region is area-downsampled and binarized before hashing, which ignores
+    anti-aliasing noise but still separates regions that differ by one glyph.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    height, width = image.shape[:2]
+    if height == 0 or width == 0:
+        return f"{width}x{height}:empty"
+
+    small = cv2.resize(image, (max(1, width // factor), max(1, height // factor)),
+                       interpolation=cv2.INTER_AREA)
+    bits = np.packbits(small > small.mean())
+    digest = hashlib.blake2b(bits.tobytes(), digest_size=16).hexdigest()
+    # The size goes into the key too: the same glyphs at another scale OCR differently
+    return f"{width}x{height}:{digest}"
+
+
+class OCRCache:
+    """LRU cache of OCR results keyed by perceptual hash, optionally persisted to disk"""
+
+    def __init__(self, max_entries=4096, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                profiler.count("ocr.cache_hits")
+                return self.entries[key]
+            self.misses += 1
+            profiler.count("ocr.cache_misses")
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self.lock:
+                for key, value in data.items():
+                    self.entries[key] = value
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load OCR cache from {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with self.lock:
+                data = dict(self.entries)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save OCR cache to {self.path}: {e}")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Return the shared OCR cache, persisted to BAMBU_OCR_CACHE when set"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = OCRCache(path=os.getenv("BAMBU_OCR_CACHE"))
+        return _default_cache
+
+
+def cached_image_to_string(image, config="", cache=None):
+    """pytesseract.image_to_string that skips Tesseract for already seen regions"""
+    import pytesseract
+
+    cache = cache or get_default_cache()
+    key = f"str|{config}|{perceptual_hash(image)}"
+    text = cache.get(key)
+    if text is None:
+        with profiler.stage("ocr"):
+            text = pytesseract.image_to_string(image, config=config)
+        cache.put(key, text)
+    return text
+
+
+def cached_image_to_data(image, config="", cache=None):
+    """pytesseract.image_to_data (as dict) that skips Tesseract for already seen regions"""
+    import pytesseract
+
+    cache = cache or get_default_cache()
+    key = f"data|{config}|{perceptual_hash(image)}"
+    data = cache.get(key)
+    if data is None:
+        with profiler.stage("ocr"):
+            raw = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+        data = {field: list(raw.get(field, [])) for field in DATA_FIELDS}
+        cache.put(key, data)
+    return data
+
+
+def tiled_image_to_data(image, band_height=256, overlap=48, config="", cache=None, parallel=True):
+    """OCR a large image as overlapping horizontal bands, each cached separately
+
+    Only bands whose content changed reach Tesseract, and with parallel=True
+    they are recognized concurrently by the shared OCR service. A word is kept
+    by the band whose core (non-overlapping part) contains its center.
+    """
+    height = image.shape[0]
+    merged = {field: [] for field in DATA_FIELDS}
+    merged['band'] = []
+
+    bands = []
+    for core_top in range(0, height, band_height):
+        core_bottom = min(core_top + band_height, height)
+        top = max(0, core_top - overlap)
+        bottom = min(height, core_bottom + overlap)
+        bands.append((core_top, core_bottom, top, bottom))
+
+    service = None
+    if parallel and len(bands) > 1:
+        from ocr_service import get_ocr_service
+        service = get_ocr_service()
+
+    crops = [image[top:bottom] for _, _, top, bottom in bands]
+    if service is not None:
+        results = service.image_to_data_many(crops, config=config)
+    else:
+        results = [cached_image_to_data(crop, config=config, cache=cache) for crop in crops]
+
+    for band, ((core_top, core_bottom, top, _), data) in enumerate(zip(bands, results)):
+        for i, text in enumerate(data['text']):
+            center_y = top + data['top'][i] + data['height'][i] // 2
+            if not core_top <= center_y < core_bottom:
+                continue
+            for field in DATA_FIELDS:
+                merged[field].append(data[field][i])
+            merged['top'][-1] += top
+            merged['band'].append(band)
+
+    return merged
+
+
+def data_to_text(data):
+    """Rebuild line-oriented text from image_to_data output"""
+    lines = OrderedDict()
+    bands = data.get('band', [0] * len(data['text']))
+    for i, text in enumerate(data['text']):
+        if not text or not text.strip():
+            continue
+        key = (bands[i], data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append((data['top'][i], data['left'][i], text))
+
+    ordered = sorted(lines.values(), key=lambda words: min(w[0] for w in words))
+    return "\n".join(" ".join(w[2] for w in sorted(words, key=lambda w: w[1])) for words in ordered)
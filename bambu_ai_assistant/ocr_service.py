@@ -0,0 +1,159 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from ocr_cache import DATA_FIELDS, get_default_cache, perceptual_hash
+from profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+
+
+class OCRWorkerError(Exception):
+    """Error raised inside an OCR worker process"""
+
+
+def _ocr_string(image, config):
+    import pytesseract
+    try:
+        return pytesseract.image_to_string(image, config=config)
+    except Exception as e:
+        # Some pytesseract exceptions cannot be pickled and would break the pool
+        raise OCRWorkerError(f"{type(e).__name__}: {e}") from None
+
+
+def _ocr_data(image, config):
+    import pytesseract
+    try:
+        raw = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        raise OCRWorkerError(f"{type(e).__name__}: {e}") from None
+    return {field: list(raw.get(field, [])) for field in DATA_FIELDS}
+
+
+def empty_data():
+    return {field: [] for field in DATA_FIELDS}
+
+
+class OCRServiceBusy(Exception):
+    """Raised when the OCR request queue is full"""
+
+
+class OCRService:
+    """Pool of Tesseract worker processes that recognizes many crops in parallel"""
+
+    def __init__(self, max_workers=None, max_pending=64, timeout=DEFAULT_TIMEOUT, cache=None):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        self.cache = cache or get_default_cache()
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def _submit(self, func, image, config, block=True, timeout=None):
+        if not block:
+            acquired = self.pending.acquire(blocking=False)
+        elif timeout is None:
+            acquired = self.pending.acquire()
+        else:
+            acquired = self.pending.acquire(timeout=timeout)
+        if not acquired:
+            raise OCRServiceBusy("Too many OCR requests are pending")
+        try:
+            future = self.executor.submit(func, image, config)
+        except Exception:
+            self.pending.release()
+            raise
+        future.add_done_callback(lambda _: self.pending.release())
+        return future
+
+    def submit_string(self, image, config="", block=True, timeout=None):
+        """Queue an image_to_string request and return its future"""
+        return self._submit(_ocr_string, image, config, block, timeout)
+
+    def submit_data(self, image, config="", block=True, timeout=None):
+        """Queue an image_to_data request and return its future"""
+        return self._submit(_ocr_data, image, config, block, timeout)
+
+    @profiler.timed("ocr.batch")
+    def _recognize_many(self, requests, kind, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        # One deadline for the whole batch, so N crops cannot take N timeouts
+        deadline = time.monotonic() + timeout
+        submit = self.submit_data if kind == "data" else self.submit_string
+        fallback = empty_data if kind == "data" else str
+
+        results = [None] * len(requests)
+        futures = {}
+        try:
+            for index, (image, config) in enumerate(requests):
+                key = f"{kind}|{config}|{perceptual_hash(image)}"
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[index] = cached
+                else:
+                    futures[index] = (key, submit(image, config))
+        except Exception:
+            # Give up on the whole batch; cancelled futures release their slots
+            for _, future in futures.values():
+                future.cancel()
+            raise
+
+        done, _ = wait([future for _, future in futures.values()],
+                       timeout=max(0.0, deadline - time.monotonic()))
+        timed_out = 0
+        for index, (key, future) in futures.items():
+            if future not in done:
+                # The worker keeps running; its result is simply dropped
+                timed_out += 1
+                results[index] = fallback()
+                continue
+            try:
+                results[index] = future.result()
+                self.cache.put(key, results[index])
+            except Exception as e:
+                logger.error(f"OCR worker error: {e}")
+                profiler.count("ocr.errors")
+                results[index] = fallback()
+
+        if timed_out:
+            logger.warning(f"{timed_out} OCR request(s) timed out after {timeout}s")
+            profiler.count("ocr.timeouts", timed_out)
+        return results
+
+    def image_to_string_many(self, images, config="", timeout=None):
+        """OCR several crops in parallel; cached crops skip the pool"""
+        return self._recognize_many([(image, config) for image in images], "str", timeout)
+
+    def image_to_string_batch(self, requests, timeout=None):
+        """OCR (image, config) pairs in parallel; cached crops skip the pool"""
+        return self._recognize_many(list(requests), "str", timeout)
+
+    def image_to_data_many(self, images, config="", timeout=None):
+        """image_to_data for several crops in parallel; cached crops skip the pool"""
+        return self._recognize_many([(image, config) for image in images], "data", timeout)
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def get_ocr_service():
+    """Return the shared OCR service, or None when BAMBU_OCR_WORKERS is 0"""
+    global _default_service
+    workers = os.getenv("BAMBU_OCR_WORKERS")
+    if workers == "0":
+        return None
+    workers = int(workers) if workers else None
+
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = OCRService(max_workers=workers)
+            atexit.register(_default_service.shutdown)
+        return _default_service
@@ -0,0 +1,121 @@
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from profiling import profiler
+
+PREVIEW_SIZE = (200, 150)
+PREVIEW_FPS = 10.0
+
+# Converting a downscaled frame to the RGB the preview shows
+TO_RGB = {'BGR': cv2.COLOR_BGR2RGB, 'BGRA': cv2.COLOR_BGRA2RGB, 'GRAY': cv2.COLOR_GRAY2RGB}
+
+# Overlay colors (RGB) by button color and readout kind
+OVERLAY_COLORS = {
+    'orange': (255, 140, 0),
+    'blue': (0, 140, 255),
+    'green': (0, 220, 0),
+    'red': (255, 40, 40),
+    'progress': (0, 220, 0),
+    'temperature': (255, 90, 90),
+    'percent': (0, 220, 0),
+}
+
+
+class PreviewRenderer:
+    """Small live preview of the analyzed frames with their detections drawn on top
+
+    Analysis workers call render(), which downsamples into buffers that are
+    allocated once and reused, draws the overlays and flips a double buffer.
+    The Tk main loop calls present() at most max_fps times a second; it pastes
+    the newest picture into one PhotoImage instead of creating a new one.
+    """
+
+    def __init__(self, max_size=PREVIEW_SIZE, max_fps=PREVIEW_FPS):
+        self.max_size = max_size
+        self.interval_ms = max(1, int(1000 / max_fps))
+        self.lock = threading.Lock()
+        self.small = None
+        self.back = None
+        self.front = None
+        self.seq = -1
+        self.version = 0
+        self.shown_version = 0
+        self.photo = None
+
+    def size_for(self, frame):
+        scale = min(self.max_size[0] / frame.width, self.max_size[1] / frame.height, 1.0)
+        return max(1, int(frame.width * scale)), max(1, int(frame.height * scale))
+
+    @profiler.timed("preview.render")
+    def render(self, frame, overlays=None, seq=None):
+        """Draw a frame and its detections into the back buffer (any thread)"""
+        width, height = self.size_for(frame)
+        # The analysis already built the coarse pyramid levels; start from one
+        source = frame.level(min(frame.pyramid_level(), max(0, int(np.log2(frame.width / width)))))
+        pixels = source.pixels
+        channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+        order = 'GRAY' if channels == 1 else frame.order
+
+        with self.lock:
+            # Analysis workers can finish out of order; never draw an older frame
+            if seq is not None and seq < self.seq:
+                profiler.count("preview.stale")
+                return False
+
+            shape = (height, width) if channels == 1 else (height, width, channels)
+            if self.small is None or self.small.shape != shape:
+                self.small = np.empty(shape, dtype=np.uint8)
+            if self.back is None or self.back.shape[:2] != (height, width):
+                self.back = np.empty((height, width, 3), dtype=np.uint8)
+                self.front = np.zeros_like(self.back)
+
+            cv2.resize(pixels, (width, height), dst=self.small, interpolation=cv2.INTER_AREA)
+            if order == 'RGB':
+                np.copyto(self.back, self.small)
+            else:
+                cv2.cvtColor(self.small, TO_RGB[order], dst=self.back)
+
+            self.draw_overlays(self.back, overlays or {}, width / frame.width)
+            self.back, self.front = self.front, self.back
+            if seq is not None:
+                self.seq = seq
+            self.version += 1
+        return True
+
+    def draw_overlays(self, image, overlays, scale):
+        """Outline detected buttons, progress bars and readout regions"""
+        def outline(rect, color):
+            x, y, w, h = (int(round(v * scale)) for v in rect)
+            cv2.rectangle(image, (x, y), (x + max(w, 1) - 1, y + max(h, 1) - 1), color, 1)
+
+        for button in overlays.get('buttons', []):
+            outline(button['position'], OVERLAY_COLORS.get(button['color'], (255, 255, 255)))
+        for bar in overlays.get('progress_bars', []):
+            outline(bar['position'], OVERLAY_COLORS['progress'])
+        for box, kind in overlays.get('readouts', []):
+            outline(box, OVERLAY_COLORS.get(kind, (255, 255, 255)))
+
+    @profiler.timed("preview.present")
+    def present(self, label):
+        """Show the newest rendered preview in a Tk label (main thread only)
+
+        Returns False when nothing new was rendered since the last call.
+        """
+        from PIL import ImageTk
+
+        with self.lock:
+            if self.version == self.shown_version:
+                return False
+            image = Image.fromarray(self.front)
+            if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+                # Only a new preview size needs a new Tk image
+                self.photo = ImageTk.PhotoImage(image)
+                label.configure(image=self.photo, text="")
+                label.image = self.photo  # Keep reference
+            else:
+                self.photo.paste(image)
+            self.shown_version = self.version
+        return True
@@ -0,0 +1,156 @@
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    """Rolling timings and counts of one stage"""
+
+    def __init__(self, window=512):
+        self.durations = collections.deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.last_error = None
+
+    def summary(self):
+        import numpy as np
+
+        durations = np.array(self.durations) * 1000
+        summary = {'calls': self.calls, 'errors': self.errors}
+        if len(durations):
+            p50, p95, p99 = np.percentile(durations, (50, 95, 99))
+            summary.update(p50_ms=round(float(p50), 3), p95_ms=round(float(p95), 3),
+                           p99_ms=round(float(p99), 3), last_ms=round(float(durations[-1]), 3))
+        if self.last_error:
+            summary['last_error'] = self.last_error
+        return summary
+
+
+class Profiler:
+    """Lightweight per-stage timing with rolling percentiles and counters
+
+    Wrap work in `with profiler.stage("name"):` or decorate it with
+    `@profiler.timed("name")`. Exceptions leaving a stage are counted as
+    errors of that stage (and re-raised), so failures that callers log and
+    swallow still show up in the numbers.
+    """
+
+    def __init__(self, window=512, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = collections.Counter()
+        self.lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(self.window)
+        return stats
+
+    def record(self, name, seconds, error=None):
+        """Add one timing to a stage (for durations not measured by stage())"""
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.durations.append(seconds)
+            if error is not None:
+                stats.errors += 1
+                stats.last_error = f"{type(error).__name__}: {error}"
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, time.perf_counter() - start, error=e)
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator timing every call of a function as a stage"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'stages': {name: stats.summary() for name, stats in sorted(self.stages.items())},
+                'counters': dict(self.counters),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def export_jsonl(self, path):
+        """Append the current snapshot to a JSON lines file"""
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write profile to {path}: {e}")
+
+    def format_table(self):
+        """Plain-text table of the stages for display"""
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<34}{'calls':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>5}"]
+        for name, s in snapshot['stages'].items():
+            if 'p50_ms' not in s:
+                continue
+            lines.append(f"{name:<34}{s['calls']:>7}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+                         f"{s['p99_ms']:>9.1f}{s['errors']:>5}")
+        if snapshot['counters']:
+            lines.append("")
+            lines.extend(f"{name}: {value}" for name, value in sorted(snapshot['counters'].items()))
+        return "\n".join(lines)
+
+
+# Shared by every module; BAMBU_PROFILE=0 turns the hooks into no-ops
+profiler = Profiler(enabled=os.getenv("BAMBU_PROFILE", "1") != "0")
+
+
+def _timed_cv2(name, function):
+    """cv2.<function> timed as a stage; OpenCV is only imported on the first call
+
+    Keeps this module (imported by everything, including the GUI at start-up)
+    free of the OpenCV and NumPy import cost.
+    """
+    def call(*args, **kwargs):
+        import cv2
+
+        with profiler.stage(name):
+            return getattr(cv2, function)(*args, **kwargs)
+    call.__name__ = function
+    return call
+
+
+# Instrumented OpenCV calls for the detectors
+in_range = _timed_cv2("segmentation", "inRange")
+canny = _timed_cv2("canny", "Canny")
+find_contours = _timed_cv2("contours", "findContours")
@@ -1,22 +1,77 @@
-import cv2
 import numpy as np
-import pytesseract
-import pyautogui
 import time
 import json
 from datetime import datetime
+from layout_profile import read_regions, parse_number
+from ocr_cache import tiled_image_to_data, data_to_text
+from frame import as_frame
+from ui_templates import get_template_library
+from profiling import profiler, in_range
+from blob_analysis import blob_stats
+from detector_scheduler import DetectorScheduler
+
+ACTION_REPORT_OUTPUTS = ('status', 'temperatures', 'progress', 'model_info', 'suggested_actions')
+
+SUGGESTION_LABELS = {
+    'slice_buttons': "Slice button",
+    'print_buttons': "Print button",
+    'settings_areas': "Settings area",
+}
+
+def outputs_for_query(user_query):
+    """Detector outputs needed to answer a query; "where is X" only locates X"""
+    query = user_query.lower()
+    locate = any(word in query for word in ("where", "find", "locate", "click"))
+    
+    if "slice" in query:
+        return ['slice_buttons'] if locate else ['slice_buttons', 'status', 'model_info']
+    if "temp" in query or "hot" in query:
+        return ['temperatures']
+    if "progress" in query or "eta" in query:
+        return ['progress']
+    if "print" in query:
+        return ['print_buttons'] if locate else ['print_buttons', 'status', 'temperatures']
+    if "settings" in query:
+        return ['settings_areas']
+    if "status" in query:
+        return ['status']
+    return list(ACTION_REPORT_OUTPUTS)
 
 class BambuVisionHelper:
-    def __init__(self):
+    def __init__(self, layout_profile=None):
         self.templates = {}
+        self.layout_profile = layout_profile
         self.load_ui_templates()
+        self.scheduler = self.build_scheduler()
         
     def load_ui_templates(self):
         """Load UI element templates for template matching"""
-        # You would save screenshots of UI elements and load them here
-        # For now, we'll use color-based detection
-        pass
+        # Templates are <name>.png crops of the UI (see ui_templates.save_template);
+        # without them detection falls back to color blobs
+        self.templates = get_template_library()
+
+    def find_buttons_by_template(self, image, name):
+        """Centers of a UI element found by template matching"""
+        return [match['center'] for match in self.templates.match(image, name)]
     
+    def build_scheduler(self):
+        """Register the detectors with what they read, so requests run only what they need"""
+        scheduler = DetectorScheduler()
+        scheduler.register('status', lambda f, r: self.detect_print_status(f), inputs=('hsv', 'ocr'))
+        scheduler.register('temperatures', lambda f, r: self.extract_temperature_info(f), inputs=('ocr',))
+        scheduler.register('progress', lambda f, r: self.detect_progress_bar(f), inputs=('gray', 'edges'))
+        scheduler.register('model_info', lambda f, r: self.get_model_info(f), inputs=('ocr',))
+        scheduler.register('slice_buttons', lambda f, r: self.find_slice_buttons(f), inputs=('gray', 'hsv'))
+        scheduler.register('print_buttons', lambda f, r: self.find_print_buttons(f), inputs=('gray', 'hsv'))
+        scheduler.register('settings_areas', lambda f, r: self.find_settings_areas(f), inputs=('gray', 'ocr'))
+        scheduler.register('suggested_actions', lambda f, r: self.suggest_actions(r['status']), inputs=('status',))
+        return scheduler
+    
+    def run_detectors(self, image, outputs):
+        """Run just the detectors needed for the given outputs"""
+        return self.scheduler.run(as_frame(image), outputs)
+    
+    @profiler.timed("helper.detect_print_status")
     def detect_print_status(self, image):
         """Detect current print status from screen"""
         status_indicators = {
@@ -31,7 +86,7 @@ class BambuVisionHelper:
     
     def detect_color_indicator(self, image, color_name):
         """Detect colored status indicators"""
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        hsv = as_frame(image).hsv
         
         color_ranges = {
             "green": [(40, 50, 50), (80, 255, 255)],
@@ -44,33 +99,37 @@ class BambuVisionHelper:
             return False
             
         lower, upper = color_ranges[color_name]
-        mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
-        
-        # Find contours and check if any are significant
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        mask = in_range(hsv, np.array(lower), np.array(upper))
         
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 100:  # Minimum area for status indicator
-                return True
-        
-        return False
+        # Check if any blob is significant (minimum area for status indicator)
+        return bool((blob_stats(mask).area > 100).any())
     
     def detect_text_pattern(self, image, patterns):
         """Detect text patterns in image"""
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            text = pytesseract.image_to_string(gray).lower()
+            gray = as_frame(image).gray
+            text = data_to_text(tiled_image_to_data(gray)).lower()
             
             return any(pattern in text for pattern in patterns)
         except:
+            profiler.count("errors.detect_text_pattern")
             return False
     
+    @profiler.timed("helper.extract_temperature_info")
     def extract_temperature_info(self, image):
         """Extract temperature information from display"""
+        if self.layout_profile is not None:
+            try:
+                regions = read_regions(as_frame(image).gray, self.layout_profile, kind='temperature')
+                values = [parse_number(r['text']) for r in regions.values()]
+                return [int(v) for v in values if v is not None and v > 20]
+            except:
+                profiler.count("errors.extract_temperature_info")
+                return []
+        
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            text = pytesseract.image_to_string(gray)
+            gray = as_frame(image).gray
+            text = data_to_text(tiled_image_to_data(gray))
             
             # Look for temperature patterns like "200°C" or "200C"
             import re
@@ -79,30 +138,34 @@ class BambuVisionHelper:
             
             return [int(temp) for temp in temperatures if int(temp) > 20]
         except:
+            profiler.count("errors.extract_temperature_info")
             return []
     
+    @profiler.timed("helper.detect_progress_bar")
     def detect_progress_bar(self, image):
         """Detect print progress from progress bars"""
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        frame = as_frame(image)
+        gray = frame.gray
         
         # Look for horizontal progress bars (rectangular shapes with specific aspect ratio)
-        edges = cv2.Canny(gray, 50, 150)
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        blobs = frame.edge_blobs
+        
+        # Progress bars are typically wide and short
+        w, h = blobs.width, blobs.height
+        blobs = blobs[(w > h * 3) & (w > 100) & (h > 10)]
         
         progress_bars = []
-        for contour in contours:
-            rect = cv2.boundingRect(contour)
+        for i in range(len(blobs)):
+            rect = blobs[i]
             w, h = rect[2], rect[3]
             
-            # Progress bars are typically wide and short
-            if w > h * 3 and w > 100 and h > 10:
-                # Analyze the fill level
-                roi = gray[rect[1]:rect[1]+h, rect[0]:rect[0]+w]
-                fill_percentage = self.analyze_fill_level(roi)
-                progress_bars.append({
-                    'position': rect,
-                    'progress': fill_percentage
-                })
+            # Analyze the fill level
+            roi = gray[rect[1]:rect[1]+h, rect[0]:rect[0]+w]
+            fill_percentage = self.analyze_fill_level(roi)
+            progress_bars.append({
+                'position': rect,
+                'progress': fill_percentage
+            })
         
         return progress_bars
     
@@ -119,14 +182,18 @@ class BambuVisionHelper:
         
         return 0
     
+    @profiler.timed("helper.get_model_info")
     def get_model_info(self, image):
         """Extract 3D model information from screen"""
         info = {}
         
+        if self.layout_profile is not None:
+            return self.get_model_info_from_regions(image)
+        
         try:
             # Extract text for model name, file size, etc.
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            text = pytesseract.image_to_string(gray)
+            gray = as_frame(image).gray
+            text = data_to_text(tiled_image_to_data(gray))
             
             # Look for common 3D printing terms
             lines = text.split('\n')
@@ -142,40 +209,73 @@ class BambuVisionHelper:
                     info['print_time'] = line
             
         except:
+            profiler.count("errors.get_model_info")
+            pass
+        
+        return info
+    
+    def get_model_info_from_regions(self, image):
+        """Read model information from the layout profile regions only"""
+        info = {}
+        region_keys = {
+            'layer_height': 'layer_height',
+            'filament': 'filament_info',
+            'file_name': 'model_file',
+            'print_time': 'print_time'
+        }
+        
+        try:
+            names = [name for name in region_keys if name in self.layout_profile.regions]
+            regions = read_regions(as_frame(image).gray, self.layout_profile, names=names)
+            for name, region in regions.items():
+                text = region['text'].strip().lower()
+                if text:
+                    info[region_keys[name]] = text
+        except:
+            profiler.count("errors.get_model_info_from_regions")
             pass
         
         return info
     
+    @profiler.timed("helper.smart_click_suggestion")
     def smart_click_suggestion(self, image, user_intent):
         """Suggest where to click based on user intent"""
         suggestions = []
         
         if "slice" in user_intent.lower():
-            # Look for slice/prepare button (usually orange or green)
-            slice_buttons = self.find_buttons_by_color(image, "orange") + \
-                          self.find_buttons_by_color(image, "green")
-            suggestions.extend([("Slice button", pos) for pos in slice_buttons])
+            suggestions.extend([("Slice button", pos) for pos in self.find_slice_buttons(image)])
         
         elif "print" in user_intent.lower():
-            # Look for print/send button
-            print_buttons = self.find_buttons_by_color(image, "blue") + \
-                           self.find_buttons_by_color(image, "green")
-            suggestions.extend([("Print button", pos) for pos in print_buttons])
+            suggestions.extend([("Print button", pos) for pos in self.find_print_buttons(image)])
         
         elif "settings" in user_intent.lower():
-            # Look for gear icons or settings text
-            settings_areas = self.find_text_areas(image, ["settings", "config"])
-            suggestions.extend([("Settings area", pos) for pos in settings_areas])
+            suggestions.extend([("Settings area", pos) for pos in self.find_settings_areas(image)])
         
         return suggestions
     
+    def find_slice_buttons(self, image):
+        """Look for slice/prepare button (usually orange or green)"""
+        return self.find_buttons_by_template(image, "slice_button") or \
+               self.find_buttons_by_color(image, "orange") + \
+               self.find_buttons_by_color(image, "green")
+    
+    def find_print_buttons(self, image):
+        """Look for print/send button"""
+        return self.find_buttons_by_template(image, "print_button") or \
+               self.find_buttons_by_color(image, "blue") + \
+               self.find_buttons_by_color(image, "green")
+    
+    def find_settings_areas(self, image):
+        """Look for gear icons or settings text"""
+        return self.find_buttons_by_template(image, "gear_icon") or \
+               self.find_text_areas(image, ["settings", "config"])
+    
+    @profiler.timed("helper.find_buttons_by_color")
     def find_buttons_by_color(self, image, color_name):
         """Find button-like shapes with specific colors"""
-        detected = self.detect_color_indicator(image, color_name)
-        if not detected:
-            return []
-        
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        # No detect_color_indicator() pre-check: it knows no orange, and the
+        # blob filter below already returns nothing when the color is absent
+        hsv = as_frame(image).hsv
         color_ranges = {
             "orange": [(10, 50, 50), (25, 255, 255)],
             "green": [(40, 50, 50), (80, 255, 255)],
@@ -186,29 +286,24 @@ class BambuVisionHelper:
             return []
         
         lower, upper = color_ranges[color_name]
-        mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+        mask = in_range(hsv, np.array(lower), np.array(upper))
         
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        blobs = blob_stats(mask)
         
-        button_positions = []
-        for contour in contours:
-            # Check if contour is button-like (rectangular, reasonable size)
-            rect = cv2.boundingRect(contour)
-            w, h = rect[2], rect[3]
-            
-            if 50 < w < 200 and 20 < h < 60:  # Typical button dimensions
-                center = (rect[0] + w//2, rect[1] + h//2)
-                button_positions.append(center)
+        # Keep button-like blobs (typical button dimensions)
+        w, h = blobs.width, blobs.height
+        blobs = blobs[(w > 50) & (w < 200) & (h > 20) & (h < 60)]
         
-        return button_positions
+        return [tuple(int(v) for v in center) for center in blobs.centers]
     
+    @profiler.timed("helper.find_text_areas")
     def find_text_areas(self, image, text_patterns):
         """Find areas containing specific text"""
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            gray = as_frame(image).gray
             
-            # Use pytesseract to get bounding boxes of text
-            data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+            # Use pytesseract to get bounding boxes of text, unchanged bands come from the cache
+            data = tiled_image_to_data(gray)
             
             positions = []
             for i, text in enumerate(data['text']):
@@ -220,32 +315,32 @@ class BambuVisionHelper:
             
             return positions
         except:
+            profiler.count("errors.find_text_areas")
             return []
     
+    @profiler.timed("helper.generate_action_report")
     def generate_action_report(self, image):
         """Generate a comprehensive report of what's visible and actionable"""
-        report = {
-            'timestamp': datetime.now().isoformat(),
-            'status': self.detect_print_status(image),
-            'temperatures': self.extract_temperature_info(image),
-            'progress': self.detect_progress_bar(image),
-            'model_info': self.get_model_info(image),
-            'suggested_actions': []
-        }
-        
-        # Add contextual suggestions
-        if report['status'].get('heating'):
-            report['suggested_actions'].append("Printer is heating - wait before starting print")
-        elif report['status'].get('printing'):
-            report['suggested_actions'].append("Print in progress - monitor temperature and progress")
-        elif not report['status']:
-            report['suggested_actions'].append("Printer appears idle - ready for new print job")
-        
+        # Share color conversions between all detectors
+        report = {'timestamp': datetime.now().isoformat()}
+        report.update(self.run_detectors(image, ACTION_REPORT_OUTPUTS))
         return report
+    
+    def suggest_actions(self, status):
+        """Add contextual suggestions"""
+        suggested_actions = []
+        if status.get('heating'):
+            suggested_actions.append("Printer is heating - wait before starting print")
+        elif status.get('printing'):
+            suggested_actions.append("Print in progress - monitor temperature and progress")
+        elif not status:
+            suggested_actions.append("Printer appears idle - ready for new print job")
+        return suggested_actions
 
 # Usage example functions
 def analyze_bambu_screen():
     """Main function to analyze current Bambu Studio screen"""
+    import pyautogui  # needs a display, so only imported when capturing
     helper = BambuVisionHelper()
     
     # Capture screen
@@ -257,15 +352,22 @@ def analyze_bambu_screen():
     
     return report
 
-def get_smart_suggestions(user_query):
-    """Get AI suggestions based on current screen and user query"""
-    helper = BambuVisionHelper()
+def get_smart_suggestions(user_query, image=None, helper=None):
+    """Get AI suggestions based on current screen and user query
     
-    screenshot = pyautogui.screenshot()
-    image = np.array(screenshot)
+    Only the detectors the query needs are run, so "where is the slice
+    button" skips OCR and the rest of the report.
+    """
+    helper = helper or BambuVisionHelper()
     
-    suggestions = helper.smart_click_suggestion(image, user_query)
-    report = helper.generate_action_report(image)
+    if image is None:
+        import pyautogui  # needs a display, so only imported when capturing
+        screenshot = pyautogui.screenshot()
+        image = np.array(screenshot)
+    
+    report = helper.run_detectors(image, outputs_for_query(user_query))
+    suggestions = [(label, pos) for output, label in SUGGESTION_LABELS.items()
+                   for pos in report.get(output, [])]
     
     return {
         'suggestions': suggestions,
@@ -277,22 +379,26 @@ def generate_recommendations(report, user_query):
     """Generate smart recommendations based on current state and user intent"""
     recommendations = []
     
+    # Queries that only locate something have no printer state to go on
+    if 'status' not in report:
+        return recommendations
+    
     query_lower = user_query.lower()
     
     if "slice" in query_lower:
-        if not report['model_info']:
+        if not report.get('model_info', True):
             recommendations.append("Load a 3D model first before slicing")
-        elif report['status'].get('printing'):
+        elif report.get('status', {}).get('printing'):
             recommendations.append("Wait for current print to finish before slicing new model")
         else:
             recommendations.append("Model loaded - ready to slice")
     
     elif "print" in query_lower:
-        if report['status'].get('heating'):
+        if report.get('status', {}).get('heating'):
             recommendations.append("Printer is heating - print will start automatically when ready")
-        elif report['status'].get('printing'):
+        elif report.get('status', {}).get('printing'):
             recommendations.append("Printer is already printing")
-        elif not report['temperatures']:
+        elif not report.get('temperatures', True):
             recommendations.append("Check printer connection and power")
         else:
             recommendations.append("Ready to start print")
@@ -0,0 +1,156 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+# Answers are only reused while the screen state they describe is recent
+RESPONSE_TTL = 300.0
+MAX_RESPONSES = 256
+
+# A cached answer is replayed as word-sized chunks, like a live stream
+REPLAY_CHUNKS = re.compile(r"\s*\S+\s*|\s+")
+
+
+def normalize_prompt(prompt):
+    """Lower-case a question and drop spacing and end punctuation that do not change it"""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip("?!. ").lower()
+
+
+def response_key(prompt, screen=None, model=None, endpoint=None, history=None):
+    """Cache key for a question asked against a screen analysis with a model config
+
+    history identifies the conversation before the question (see
+    Conversation.history_key), so a follow-up such as "why?" is only a repeat
+    after the same earlier turns.
+    """
+    data = json.dumps([normalize_prompt(prompt), list(screen or []), model, endpoint, history])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """LRU cache of chat answers that expire after a TTL, optionally persisted to disk"""
+
+    def __init__(self, max_entries=MAX_RESPONSES, ttl=RESPONSE_TTL, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                profiler.count("chat.cache_misses")
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            profiler.count("chat.cache_hits")
+            return entry[1]
+
+    def put(self, key, text):
+        with self.lock:
+            self.entries[key] = (time.time(), text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            now = time.time()
+            with self.lock:
+                # Oldest first, so the LRU order survives the round trip
+                for key, (created, text) in sorted(data.items(), key=lambda item: item[1][0]):
+                    if now - created <= self.ttl:
+                        self.entries[key] = (created, text)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Could not load chat cache from {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with self.lock:
+                data = dict(self.entries)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save chat cache to {self.path}: {e}")
+
+
+class CachedChatClient:
+    """ChatAPIClient front that answers repeated questions from a ResponseCache
+
+    A question is a repeat when its normalized text, the screen analysis it
+    was asked against, the conversation before it and the model and endpoint
+    all match. Cached answers
+    are replayed through send() as a stream, so callers cannot tell them
+    apart except by speed. Only complete answers are cached.
+    """
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache or get_response_cache()
+
+    def cancel(self):
+        self.client.cancel()
+
+    def send(self, user_message, screen=None, cancel=None):
+        conversation = self.client.conversation
+        history = conversation.history_key() if conversation is not None else None
+        key = response_key(user_message, screen, self.client.model, self.client.endpoint, history)
+        text = self.cache.get(key)
+        if text is not None:
+            for chunk in REPLAY_CHUNKS.findall(text):
+                if cancel is not None and cancel.is_set():
+                    return
+                yield chunk
+            # Like a live answer, a replay joins the conversation only once complete
+            if conversation is not None:
+                conversation.add_turn(user_message, screen, text)
+            return
+
+        chunks = []
+        for chunk in self.client.send(user_message, screen=screen, cancel=cancel):
+            chunks.append(chunk)
+            yield chunk
+        if chunks and not (cancel is not None and cancel.is_set()):
+            self.cache.put(key, "".join(chunks))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the shared chat answer cache, persisted to BAMBU_CHAT_CACHE when set"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(path=os.getenv("BAMBU_CHAT_CACHE"))
+        return _default_cache
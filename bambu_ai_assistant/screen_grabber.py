@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from frame import Frame
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenGrabber:
+    """Persistent screen capture bound to the Bambu Studio window
+
+    One mss instance is kept per thread (mss handles are not shareable across
+    threads) instead of opening a new one for every frame. Frames are returned
+    as zero-copy BGRA views over the grabbed buffer.
+
+    The grab buffer itself is not reused: mss.grab() always returns its pixels
+    in a new bytearray, and has no API to grab into a caller's array. Copying
+    that into a preallocated array would add a full-frame copy and still
+    allocate, so frames keep the buffer mss hands out.
+    """
+
+    def __init__(self, window=None):
+        self.window = window
+        self.local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self.local, 'sct', None)
+        if sct is None:
+            import mss
+            sct = self.local.sct = mss.mss()
+        return sct
+
+    def set_window(self, window):
+        self.window = window
+
+    def window_rect(self, sct):
+        """Current window rectangle clipped to the desktop, or None"""
+        window = self.window
+        if window is None:
+            return None
+        try:
+            if window.isMinimized:
+                return None
+            left, top, width, height = window.left, window.top, window.width, window.height
+        except Exception as e:
+            logger.warning(f"Lost track of the Bambu Studio window: {e}")
+            return None
+
+        desktop = sct.monitors[0]
+        right = min(left + width, desktop['left'] + desktop['width'])
+        bottom = min(top + height, desktop['top'] + desktop['height'])
+        left = max(left, desktop['left'])
+        top = max(top, desktop['top'])
+        if right - left <= 0 or bottom - top <= 0:
+            return None
+        return {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+
+    def grab(self):
+        """Grab the window (focused or not) or else the primary monitor"""
+        sct = self._sct()
+        rect = self.window_rect(sct)
+        monitor = rect or sct.monitors[1]
+
+        shot = sct.grab(monitor)
+        pixels = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return Frame(pixels, 'BGRA', time.time(), (monitor['left'], monitor['top']), window=rect is not None)
+
+    def close(self):
+        sct = getattr(self.local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self.local.sct = None
@@ -8,6 +8,9 @@ import math
 MODELS_DIR = "models"
 OUTPUTS_DIR = "outputs"
 
+# Reply for input that is not a slicer command
+UNKNOWN_COMMAND = "Unknown command. Try: scale, rotate, material, check, move, set printer."
+
 def handle_command(command):
     command = command.lower()
 
@@ -65,7 +68,7 @@ def handle_command(command):
         rotate_model(model, output, angle)
         return f"Model rotated {angle}° around Z axis."
 
-    return "Unknown command. Try: scale, rotate, material, check, move, set printer."
+    return UNKNOWN_COMMAND
 
 def extract_scale(text):
     import re
@@ -0,0 +1,247 @@
+import threading
+import time
+
+import numpy as np
+
+METRICS = ('nozzle_temp', 'bed_temp', 'progress', 'status')
+STATUS_FLAGS = ('printing', 'heating', 'paused', 'completed', 'error')
+
+# (bucket seconds, rows): raw samples, then 10 s means for a day and minute
+# means for a week; about 700 KB in total however long a print runs
+DEFAULT_TIERS = ((0, 4096), (10, 8640), (60, 10080))
+
+
+def status_bits(status):
+    """Pack a {flag: bool} status dict into a bitmask"""
+    bits = 0
+    for i, flag in enumerate(STATUS_FLAGS):
+        if status.get(flag):
+            bits |= 1 << i
+    return bits
+
+
+def status_flags(bits):
+    """Unpack a status bitmask into the list of set flags"""
+    if bits is None or np.isnan(bits):
+        return []
+    return [flag for i, flag in enumerate(STATUS_FLAGS) if int(bits) & (1 << i)]
+
+
+class RingBuffer:
+    """Fixed-size array of timestamped metric rows, oldest rows overwritten"""
+
+    def __init__(self, capacity, columns=len(METRICS)):
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, columns), np.nan, dtype=np.float32)
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp, row):
+        self.times[self.head] = timestamp
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    @property
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.times[(self.head - self.count) % self.capacity]
+
+    def since(self, start):
+        """Rows with timestamp >= start, oldest first"""
+        if self.count < self.capacity:
+            segments = [slice(0, self.count)]
+        else:
+            segments = [slice(self.head, self.capacity), slice(0, self.head)]
+
+        times, values = [], []
+        for segment in segments:
+            seg_times = self.times[segment]
+            first = np.searchsorted(seg_times, start)
+            times.append(seg_times[first:])
+            values.append(self.values[segment][first:])
+        return np.concatenate(times), np.concatenate(values)
+
+
+class Downsampler:
+    """Accumulates rows into fixed time buckets and emits one row per bucket"""
+
+    def __init__(self, seconds, columns=len(METRICS)):
+        self.seconds = seconds
+        self.bucket = None
+        self.sums = np.zeros(columns, dtype=np.float64)
+        self.counts = np.zeros(columns, dtype=np.int64)
+        self.last = np.full(columns, np.nan, dtype=np.float32)
+
+    def add(self, timestamp, row):
+        """Add a row; returns (time, row) for a bucket it closed, or None"""
+        bucket = int(timestamp // self.seconds)
+        closed = None
+        if self.bucket is not None and bucket != self.bucket:
+            closed = self.flush()
+        self.bucket = bucket
+
+        present = ~np.isnan(row)
+        self.sums[present] += row[present]
+        self.counts[present] += 1
+        self.last[present] = row[present]
+        return closed
+
+    def flush(self):
+        with np.errstate(invalid='ignore'):
+            row = (self.sums / self.counts).astype(np.float32)
+        # Status is a bitmask, so keep the last value instead of a mean
+        status = METRICS.index('status')
+        row[status] = self.last[status]
+        closed = ((self.bucket + 0.5) * self.seconds, row)
+        self.sums[:] = 0
+        self.counts[:] = 0
+        self.last[:] = np.nan
+        return closed
+
+
+class TelemetryStore:
+    """Fixed-memory history of printer metrics read off the screen
+
+    Every tier is a ring buffer; coarser tiers hold bucket means so windowed
+    queries over hours or days stay cheap and memory never grows.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = [(seconds, RingBuffer(rows)) for seconds, rows in tiers]
+        self.downsamplers = [Downsampler(seconds) if seconds else None for seconds, _ in tiers]
+        self.last_time = None
+        self.last_row = None
+        self.lock = threading.Lock()
+
+    def record(self, timestamp=None, **metrics):
+        """Store one sample; unknown or missing metrics are left empty"""
+        timestamp = time.time() if timestamp is None else timestamp
+        row = np.full(len(METRICS), np.nan, dtype=np.float32)
+        for i, name in enumerate(METRICS):
+            value = metrics.get(name)
+            if value is not None:
+                row[i] = value
+        if np.isnan(row).all():
+            return
+
+        with self.lock:
+            self.last_row = row
+            self._append(timestamp, row)
+
+    def heartbeat(self, timestamp=None, min_interval=1.0):
+        """Repeat the latest sample for a frame skipped because nothing changed
+
+        An unchanged screen shows unchanged readouts, so the history keeps
+        growing on a static screen and the stall alert can fire. Returns
+        whether a sample was stored (at most one per min_interval seconds).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            if self.last_row is None or timestamp - self.last_time < min_interval:
+                return False
+            self._append(timestamp, self.last_row)
+        return True
+
+    def _append(self, timestamp, row):
+        # Analysis workers can finish out of order; keep time monotonic
+        if self.last_time is not None and timestamp < self.last_time:
+            timestamp = self.last_time
+        self.last_time = timestamp
+        for (seconds, buffer), sampler in zip(self.tiers, self.downsamplers):
+            if sampler is None:
+                buffer.append(timestamp, row)
+            else:
+                closed = sampler.add(timestamp, row)
+                if closed is not None:
+                    buffer.append(*closed)
+
+    def record_report(self, report, timestamp=None):
+        """Store the metrics of a generate_action_report or generate_detailed_report result"""
+        metrics = {}
+
+        if 'ui_elements' in report:
+            displays = report['ui_elements'].get('temperature_displays', [])
+            by_region = {d.get('region'): d['value'] for d in displays}
+            temperatures = [d['value'] for d in displays]
+            metrics['nozzle_temp'] = by_region.get('nozzle_temp')
+            metrics['bed_temp'] = by_region.get('bed_temp')
+            bars = [pb['estimated_progress'] for pb in report['ui_elements'].get('progress_bars', [])]
+        else:
+            temperatures = report.get('temperatures', [])
+            bars = [pb['progress'] for pb in report.get('progress', [])]
+            if report.get('status') is not None:
+                metrics['status'] = status_bits(report['status'])
+
+        # Unlabelled readouts: the nozzle is the hottest, a bed runs at 120 °C at most
+        if temperatures and metrics.get('nozzle_temp') is None:
+            metrics['nozzle_temp'] = max(temperatures)
+            if len(temperatures) > 1 and min(temperatures) <= 120:
+                metrics['bed_temp'] = min(temperatures)
+        if bars:
+            metrics['progress'] = max(bars)
+
+        if timestamp is None:
+            timestamp = report.get('timestamp')
+            if not isinstance(timestamp, (int, float)):
+                timestamp = None
+        self.record(timestamp, **metrics)
+
+    def series(self, metric, window):
+        """(times, values) of a metric over the last window seconds, from the finest tier covering it"""
+        column = METRICS.index(metric)
+        with self.lock:
+            if self.last_time is None:
+                return np.empty(0), np.empty(0, dtype=np.float32)
+            start = self.last_time - window
+            filled = [tier for _, tier in self.tiers if tier.count]
+            covering = [tier for tier in filled if tier.oldest <= start]
+            buffer = covering[0] if covering else min(filled, key=lambda tier: tier.oldest)
+            times, values = buffer.since(start)
+        values = values[:, column]
+        present = ~np.isnan(values)
+        return times[present], values[present]
+
+    def latest(self, metric, window=60):
+        """Most recent value of a metric within the window, or None"""
+        times, values = self.series(metric, window)
+        return float(values[-1]) if len(values) else None
+
+    def rate(self, metric, window=600):
+        """Least-squares change of a metric per second over the window"""
+        times, values = self.series(metric, window)
+        if len(times) < 2 or times[-1] - times[0] <= 0:
+            return None
+        t = times - times[0]
+        t_mean = t.mean()
+        return float(((t - t_mean) * (values - values.mean())).sum() / ((t - t_mean) ** 2).sum())
+
+    def eta(self, window=600):
+        """Seconds until progress reaches 100 % at the recent rate, or None"""
+        rate = self.rate('progress', window)
+        progress = self.latest('progress')
+        if rate is None or rate <= 0 or progress is None:
+            return None
+        return max(0.0, (100.0 - progress) / rate)
+
+    def anomalies(self, window=300, temp_drop=15.0, stall_window=600):
+        """Human-readable alerts about the recent history"""
+        alerts = []
+        for metric, label in (('nozzle_temp', "Nozzle"), ('bed_temp', "Bed")):
+            times, values = self.series(metric, window)
+            if len(values) >= 5:
+                baseline = float(np.median(values))
+                if baseline > 50 and baseline - values[-1] > temp_drop:
+                    alerts.append(f"{label} temperature dropped to {values[-1]:.0f}°C (was ~{baseline:.0f}°C)")
+
+        flags = status_flags(self.latest('status'))
+        if 'error' in flags:
+            alerts.append("Printer reports an error")
+
+        times, values = self.series('progress', stall_window)
+        if (len(values) >= 2 and times[-1] - times[0] >= stall_window * 0.9
+                and 0 < values[-1] < 100 and values.max() - values.min() < 1):
+            alerts.append(f"Progress stuck at {values[-1]:.0f}% for {stall_window // 60} minutes")
+        return alerts
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from frame import as_frame
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Where each element is expected, as fractions of the window (x, y, w, h).
+# None searches the whole frame.
+TEMPLATE_SPECS = {
+    'slice_button': {'search': (0.55, 0.00, 0.45, 0.12), 'threshold': 0.8},
+    'print_button': {'search': (0.55, 0.00, 0.45, 0.12), 'threshold': 0.8},
+    'plate_tab': {'search': (0.20, 0.05, 0.60, 0.10), 'threshold': 0.75, 'max_matches': 16},
+    'gear_icon': {'search': (0.00, 0.00, 0.35, 0.60), 'threshold': 0.75, 'max_matches': 8},
+}
+
+# Templates are captured at one UI scale; these cover common DPI settings
+TEMPLATE_SCALES = (0.75, 1.0, 1.25, 1.5, 2.0)
+
+
+class UITemplate:
+    """One UI element, resized once to every scale it is matched at"""
+
+    def __init__(self, name, image, search=None, threshold=0.8, max_matches=1, scales=TEMPLATE_SCALES):
+        self.name = name
+        self.search = search
+        self.threshold = threshold
+        self.max_matches = max_matches
+        self.scaled = []
+        for scale in scales:
+            size = (int(round(image.shape[1] * scale)), int(round(image.shape[0] * scale)))
+            if size[0] < 8 or size[1] < 8:
+                continue
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            self.scaled.append((scale, cv2.resize(image, size, interpolation=interpolation)))
+
+    def search_box(self, shape, window=True):
+        """Expected region in pixels; full screen grabs are searched entirely"""
+        height, width = shape[:2]
+        if self.search is None or not window:
+            return 0, 0, width, height
+        rx, ry, rw, rh = self.search
+        x, y = int(rx * width), int(ry * height)
+        return x, y, min(int(rw * width), width - x), min(int(rh * height), height - y)
+
+
+class TemplateLibrary:
+    """Bambu Studio UI templates loaded from <name>.png files in a directory"""
+
+    def __init__(self, directory=None, specs=TEMPLATE_SPECS):
+        self.directory = directory or os.getenv("BAMBU_UI_TEMPLATES", TEMPLATE_DIR)
+        self.specs = specs
+        self.templates = {}
+
+    def load(self):
+        for name, spec in self.specs.items():
+            path = os.path.join(self.directory, f"{name}.png")
+            if not os.path.exists(path):
+                continue
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                logger.warning(f"Could not read UI template {path}")
+                continue
+            self.templates[name] = UITemplate(
+                name, image,
+                search=spec.get('search'),
+                threshold=spec.get('threshold', 0.8),
+                max_matches=spec.get('max_matches', 1),
+            )
+        if self.templates:
+            logger.info(f"Loaded UI templates: {', '.join(sorted(self.templates))}")
+        else:
+            logger.info(f"No UI templates in {self.directory}; elements are found by color only")
+        return self
+
+    def __contains__(self, name):
+        return name in self.templates
+
+    def __len__(self):
+        return len(self.templates)
+
+    def match(self, image, name):
+        """Find a template inside its expected region; returns matches best first"""
+        template = self.templates.get(name)
+        if template is None:
+            return []
+
+        frame = as_frame(image)
+        x0, y0, w, h = template.search_box(frame.shape, frame.window)
+        if w <= 0 or h <= 0:
+            return []
+        # TM_CCOEFF_NORMED is insensitive to brightness and contrast changes
+        region = frame.crop(x0, y0, w, h).gray
+
+        candidates = []
+        for scale, scaled in template.scaled:
+            th, tw = scaled.shape[:2]
+            if th > region.shape[0] or tw > region.shape[1]:
+                continue
+            scores = cv2.matchTemplate(region, scaled, cv2.TM_CCOEFF_NORMED)
+            ys, xs = np.nonzero(scores >= template.threshold)
+            for x, y in zip(xs, ys):
+                candidates.append((float(scores[y, x]), int(x), int(y), tw, th, scale))
+
+        # Keep the best match per location (simple non-maximum suppression)
+        candidates.sort(reverse=True)
+        matches = []
+        for score, x, y, tw, th, scale in candidates:
+            if any(abs(x - m[1]) < tw // 2 and abs(y - m[2]) < th // 2 for m in matches):
+                continue
+            matches.append((score, x, y, tw, th, scale))
+            if len(matches) >= template.max_matches:
+                break
+
+        return [{
+            'name': name,
+            'position': (x0 + x, y0 + y, tw, th),
+            'center': (x0 + x + tw // 2, y0 + y + th // 2),
+            'confidence': score,
+            'scale': scale,
+        } for score, x, y, tw, th, scale in matches]
+
+
+def save_template(image, rect, name, directory=None):
+    """Save a crop of a screenshot as the template for a UI element"""
+    directory = directory or os.getenv("BAMBU_UI_TEMPLATES", TEMPLATE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    x, y, w, h = rect
+    path = os.path.join(directory, f"{name}.png")
+    cv2.imwrite(path, as_frame(image).crop(x, y, w, h).gray)
+    return path
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_template_library():
+    """Return the shared template library, loading it on first use"""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = TemplateLibrary().load()
+        return _library
@@ -0,0 +1,148 @@
+import threading
+
+
+def offset_item(item, dx, dy):
+    """Copy of a detection with its position and center moved by (dx, dy)"""
+    moved = dict(item)
+    x, y, w, h = item['position']
+    moved['position'] = (x + dx, y + dy, w, h)
+    if 'center' in item:
+        cx, cy = item['center']
+        moved['center'] = (cx + dx, cy + dy)
+    return moved
+
+
+def rect_distance(a, b):
+    """Largest difference between the edges of two (x, y, w, h) rects"""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]),
+               abs(a[0] + a[2] - b[0] - b[2]), abs(a[1] + a[3] - b[1] - b[3]))
+
+
+class TrackedElement:
+    """A detection carried over between frames"""
+
+    def __init__(self, item):
+        self.item = item
+        self.confidence = 1.0
+        self.misses = 0
+
+
+def same_element(key=None, max_distance=48):
+    """Match detections that lie close together (and agree on item[key])"""
+    def same(old, new):
+        if key is not None and old.get(key) != new.get(key):
+            return False
+        return rect_distance(old['position'], new['position']) <= max_distance
+    return same
+
+
+class UIElementTracker:
+    """Keep detected UI elements between frames and re-check them locally
+
+    Each kind of element (buttons, progress bars, ...) is fully detected once,
+    then re-detected only inside a small window around every tracked element.
+    A full detection runs again every `redetect_every` frames, when the frame
+    size changes, when a track's confidence drops below `min_confidence`, or
+    on every frame while nothing of that kind has been found.
+    Moves of up to `jitter` pixels keep the previous position.
+    """
+
+    def __init__(self, redetect_every=30, min_confidence=0.5, margin=24, jitter=2, max_misses=2):
+        self.redetect_every = redetect_every
+        self.min_confidence = min_confidence
+        self.margin = margin
+        self.jitter = jitter
+        self.max_misses = max_misses
+
+        self.tracks = {}
+        self.frames_since_full = {}
+        self.shapes = {}
+        self.lock = threading.Lock()
+        self.full_detections = 0
+        self.local_detections = 0
+
+    def reset(self):
+        with self.lock:
+            self.tracks.clear()
+            self.frames_since_full.clear()
+            self.shapes.clear()
+
+    def needs_full(self, kind, shape):
+        tracks = self.tracks.get(kind)
+        # Each kind remembers the frame size of its own last full pass
+        if not tracks or shape != self.shapes.get(kind):
+            return True
+        if self.frames_since_full.get(kind, 0) >= self.redetect_every:
+            return True
+        return any(track.confidence < self.min_confidence for track in tracks)
+
+    def update(self, kind, frame, detect, same):
+        """Return the elements of one kind in this frame
+
+        detect(frame) finds elements in a Frame (or a crop of one) and
+        same(old_item, new_item) tells whether a re-detection is the tracked
+        element.
+        """
+        with self.lock:
+            shape = frame.shape[:2]
+            if self.needs_full(kind, shape):
+                return self._full(kind, frame, shape, detect, same)
+
+            self.frames_since_full[kind] = self.frames_since_full.get(kind, 0) + 1
+            self.local_detections += 1
+            kept = []
+            for track in self.tracks[kind]:
+                found = self._relocate(track, frame, detect, same)
+                if found is None:
+                    track.misses += 1
+                    track.confidence *= 0.5
+                    if track.misses > self.max_misses:
+                        continue
+                else:
+                    self._follow(track, found)
+                kept.append(track)
+            self.tracks[kind] = kept
+            return [track.item for track in kept]
+
+    def _full(self, kind, frame, shape, detect, same):
+        previous = list(self.tracks.get(kind, [])) if shape == self.shapes.get(kind) else []
+        self.shapes[kind] = shape
+        self.frames_since_full[kind] = 0
+        self.full_detections += 1
+
+        tracks = []
+        for item in detect(frame):
+            track = TrackedElement(item)
+            # Carry the old position over so a full pass does not cause a jump
+            for old in previous:
+                if same(old.item, item):
+                    self._follow(old, item)
+                    previous.remove(old)
+                    track = old
+                    break
+            tracks.append(track)
+        self.tracks[kind] = tracks
+        return [track.item for track in tracks]
+
+    def _relocate(self, track, frame, detect, same):
+        x, y, w, h = track.item['position']
+        x1, y1 = max(0, x - self.margin), max(0, y - self.margin)
+        x2 = min(frame.width, x + w + self.margin)
+        y2 = min(frame.height, y + h + self.margin)
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        candidates = [offset_item(item, x1, y1) for item in detect(frame.crop(x1, y1, x2 - x1, y2 - y1))]
+        candidates = [item for item in candidates if same(track.item, item)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda item: rect_distance(item['position'], track.item['position']))
+
+    def _follow(self, track, item):
+        if rect_distance(item['position'], track.item['position']) <= self.jitter:
+            item = dict(item, position=track.item['position'])
+            if 'center' in track.item:
+                item['center'] = track.item['center']
+        track.item = item
+        track.misses = 0
+        track.confidence = 1.0
@@ -0,0 +1,452 @@
+"""Benchmark and regression check for the vision detectors
+
+Renders synthetic Bambu Studio frames with known buttons, progress bar and
+temperature readouts, times every detector and compares its output with the
+golden results in benchmarks/golden.json and with the rendered ground truth
+(KNOWN_GAPS lists the misses that are not fixed yet). A UI template captured from the
+1080p frame is matched at the other resolutions too. Runs headless:
+
+    python vision_benchmark.py                  # check against golden
+    python vision_benchmark.py --update-golden  # accept the current outputs
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from advanced_vision import AdvancedBambuVision
+from realtime_helper import BambuVisionHelper
+from layout_profile import LayoutProfile, load_profiles, select_profile, studio_version_from_title, parse_number
+from frame import Frame
+from digit_reader import DigitReader
+from ui_templates import TemplateLibrary, save_template
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "golden.json")
+
+RESOLUTIONS = {
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+}
+
+# Colors in RGB, as the older helpers expect
+BACKGROUND = (38, 38, 42)
+TOOLBAR = (52, 52, 58)
+ORANGE = (255, 140, 0)
+BLUE = (0, 120, 255)
+GREEN = (0, 200, 0)
+BED = (70, 70, 74)
+
+
+# (resolution, truth check) pairs that are known to fail, with the reason.
+# They are reported but do not fail the run; one that starts passing does.
+KNOWN_GAPS = {
+    ('4k', 'realtime.find_buttons_by_color.orange'): "button size limits are fixed pixels (at most 200x60)",
+    ('4k', 'realtime.find_buttons_by_color.blue'): "button size limits are fixed pixels (at most 200x60)",
+    ('1440p', 'advanced.find_buttons.orange'): "button area limits are fixed pixels (at most 5000)",
+    ('1440p', 'advanced.find_buttons.blue'): "button area limits are fixed pixels (at most 5000)",
+    ('4k', 'advanced.find_buttons.orange'): "button area limits are fixed pixels (at most 5000)",
+    ('4k', 'advanced.find_buttons.blue'): "button area limits are fixed pixels (at most 5000)",
+    ('1080p', 'realtime.detect_progress_bar.progress'): "fill is estimated from half-bar brightness",
+    ('1440p', 'realtime.detect_progress_bar.progress'): "fill is estimated from half-bar brightness",
+    ('4k', 'realtime.detect_progress_bar.progress'): "fill is estimated from half-bar brightness",
+    ('1080p', 'advanced.find_progress_indicators.progress'): "the outline's edges hide the fill edge",
+    ('1440p', 'advanced.find_progress_indicators.progress'): "the outline's edges hide the fill edge",
+    ('4k', 'advanced.find_progress_indicators.progress'): "the outline's edges hide the fill edge",
+    ('1080p', 'advanced.analyze_print_bed'): "the dark background is taken for the bed",
+    ('1440p', 'advanced.analyze_print_bed'): "the dark background is taken for the bed",
+    ('4k', 'advanced.analyze_print_bed'): "the dark background is taken for the bed",
+}
+
+# A detection matches a rendered element when they overlap this much
+MIN_OVERLAP = 0.5
+PROGRESS_TOLERANCE = 10
+
+
+def render_frame(width, height):
+    """Draw a synthetic Bambu Studio window; returns (RGB pixels, ground truth)
+
+    Everything is laid out on a 1920x1080 grid and scaled, so the elements sit
+    where the bambu-studio-default layout profile expects them.
+    """
+    s = width / 1920
+
+    def box(x, y, w, h):
+        return int(x * s), int(y * s), int(w * s), int(h * s)
+
+    def rect(image, x, y, w, h, color, thickness=-1):
+        x, y, w, h = box(x, y, w, h)
+        cv2.rectangle(image, (x, y), (x + w - 1, y + h - 1), color, thickness)
+        return x, y, w, h
+
+    def text(image, value, x, y, size=0.8):
+        cv2.putText(image, value, (int(x * s), int(y * s)), cv2.FONT_HERSHEY_SIMPLEX,
+                    size * s, (235, 235, 235), max(1, int(2 * s)), cv2.LINE_AA)
+
+    image = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+    rect(image, 0, 0, 1920, 56, TOOLBAR)
+    rect(image, 0, 56, 345, 1024, TOOLBAR)
+
+    truth = {'buttons': [], 'progress': 40, 'nozzle_temp': 220, 'bed_temp': 60}
+    truth['buttons'].append({'color': 'orange', 'position': rect(image, 1560, 10, 110, 36, ORANGE)})
+    truth['buttons'].append({'color': 'blue', 'position': rect(image, 1690, 10, 110, 36, BLUE)})
+    text(image, "Slice", 1584, 36, 0.7)
+    text(image, "Print", 1716, 36, 0.7)
+
+    # Print bed with a grid and a model on it
+    bed = rect(image, 560, 300, 760, 560, BED)
+    for i in range(1, 8):
+        rect(image, 560 + i * 95, 300, 1, 560, (90, 90, 94))
+        rect(image, 560, 300 + i * 70, 760, 1, (90, 90, 94))
+    points = (np.array([[860, 480], [1040, 450], [1090, 640], [900, 700], [820, 600]]) * s).astype(np.int32)
+    cv2.fillPoly(image, [points], (170, 200, 170))
+    truth['bed'] = bed
+
+    # Progress bar, outlined and filled to 40 %
+    truth['progress_bar'] = rect(image, 700, 1000, 520, 20, (200, 200, 200), max(1, int(2 * s)))
+    rect(image, 703, 1003, 206, 14, GREEN)
+
+    text(image, "40%", 1160, 90)
+    text(image, "220/220C", 1550, 188)
+    text(image, "60/60C", 1550, 231)
+    text(image, "Layer: 0.20mm", 10, 350, 0.6)
+    return image, truth
+
+
+def normalize(value):
+    """Make a detector output comparable as JSON"""
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return round(float(value), 3)
+    return value
+
+
+def make_detectors():
+    """{name: detector(frame)} for every detector whose output is checked"""
+    advanced = AdvancedBambuVision(tracking=False)
+    helper = BambuVisionHelper()
+    return {
+        'advanced.find_buttons': advanced.find_buttons,
+        'advanced.find_progress_indicators': advanced.find_progress_indicators,
+        'advanced.detect_3d_model_preview': advanced.detect_3d_model_preview,
+        'advanced.analyze_print_bed': advanced.analyze_print_bed,
+        'realtime.detect_color_indicator': lambda f: {color: helper.detect_color_indicator(f, color)
+                                                      for color in ('green', 'red', 'yellow', 'blue')},
+        'realtime.detect_progress_bar': helper.detect_progress_bar,
+        'realtime.find_buttons_by_color': lambda f: {color: helper.find_buttons_by_color(f, color)
+                                                     for color in ('orange', 'green', 'blue')},
+    }, advanced
+
+
+def make_ocr_checks(width, height):
+    """Detectors that need Tesseract, checked against the rendered values"""
+    profile = select_profile(width, height)
+    advanced = AdvancedBambuVision(layout_profile=profile, tracking=False)
+    helper = BambuVisionHelper(layout_profile=profile)
+
+    def temperatures(frame):
+        return sorted(area['value'] for area in advanced.find_temperature_regions(frame))
+
+    return {
+        'advanced.find_temperature_regions': (temperatures, lambda truth: sorted([truth['nozzle_temp'], truth['bed_temp']])),
+        'realtime.extract_temperature_info': (lambda f: sorted(helper.extract_temperature_info(f)),
+                                              lambda truth: sorted([truth['nozzle_temp'], truth['bed_temp']])),
+    }
+
+
+def digit_texts(truth):
+    """Text of the numeric readouts render_frame draws, by layout region"""
+    return {
+        'nozzle_temp': f"{truth['nozzle_temp']}/{truth['nozzle_temp']}C",
+        'bed_temp': f"{truth['bed_temp']}/{truth['bed_temp']}C",
+        'print_progress': f"{truth['progress']}%",
+    }
+
+
+def train_digit_reader():
+    """A DigitReader taught the 1080p readouts, as Tesseract fallbacks would teach it"""
+    reader = DigitReader()
+    pixels, truth = render_frame(*RESOLUTIONS['1080p'])
+    gray = Frame(pixels, 'RGB').gray
+    profile = select_profile(*RESOLUTIONS['1080p'])
+    for name, text in digit_texts(truth).items():
+        reader.learn(profile.crop(gray, name), text)
+    return reader
+
+
+def overlap(a, b):
+    """Intersection over union of two (x, y, w, h) rects"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def inside(point, rect):
+    return rect[0] <= point[0] < rect[0] + rect[2] and rect[1] <= point[1] < rect[1] + rect[3]
+
+
+def best_match(rects, expected):
+    """The rect that overlaps `expected` most, or None"""
+    rects = [tuple(r) for r in rects]
+    return max(rects, key=lambda r: overlap(r, expected), default=None)
+
+
+def truth_checks(outputs, truth):
+    """Check normalized detector outputs against the rendered elements
+
+    Returns {check name: {'output', 'expected', 'ok'}}.
+    """
+    checks = {}
+
+    def check(name, output, expected, ok):
+        checks[name] = {'output': output, 'expected': expected, 'ok': bool(ok)}
+
+    for button in truth['buttons']:
+        color, expected = button['color'], list(button['position'])
+        centers = outputs['realtime.find_buttons_by_color'].get(color, [])
+        check(f'realtime.find_buttons_by_color.{color}', centers, expected,
+              any(inside(center, expected) for center in centers))
+        found = best_match([b['position'] for b in outputs['advanced.find_buttons'] if b['color'] == color], expected)
+        check(f'advanced.find_buttons.{color}', found, expected,
+              found is not None and overlap(found, expected) >= MIN_OVERLAP)
+
+    expected = list(truth['progress_bar'])
+    for name, key in (('realtime.detect_progress_bar', 'progress'),
+                      ('advanced.find_progress_indicators', 'estimated_progress')):
+        bars = {tuple(bar['position']): bar[key] for bar in outputs[name]}
+        found = best_match(bars, expected)
+        located = found is not None and overlap(found, expected) >= MIN_OVERLAP
+        check(name, found, expected, located)
+        value = bars[found] if located else None
+        check(f'{name}.progress', value, truth['progress'],
+              value is not None and abs(value - truth['progress']) <= PROGRESS_TOLERANCE)
+
+    bed = outputs['advanced.analyze_print_bed']
+    found = bed.get('bed_area') if bed.get('bed_detected') else None
+    check('advanced.analyze_print_bed', found, list(truth['bed']),
+          found is not None and overlap(found, truth['bed']) >= MIN_OVERLAP)
+    return checks
+
+
+def layout_version_checks():
+    """Select profiles for Studio versions read from window titles
+
+    Returns {check name: {'output', 'expected', 'ok'}}.
+    """
+    profiles = load_profiles()
+    default = profiles['bambu-studio-default']
+    profiles['studio-2'] = LayoutProfile('studio-2', default.regions, studio_version="2.0",
+                                         reference_size=default.reference_size)
+    cases = {
+        'layout.version_2': ("Bambu Studio V02.00.01.50", 'studio-2'),
+        'layout.version_1': ("Bambu Studio V01.09.07.52", 'bambu-studio-default'),
+        'layout.no_version': ("benchy.3mf - Bambu Studio", 'bambu-studio-default'),
+    }
+    checks = {}
+    for name, (title, expected) in cases.items():
+        profile = select_profile(1920, 1080, version=studio_version_from_title(title), profiles=profiles)
+        checks[name] = {'output': profile.name, 'expected': expected, 'ok': profile.name == expected}
+    return checks
+
+
+def make_template_library(directory):
+    """A library holding the Slice button captured from the 1080p frame"""
+    pixels, truth = render_frame(*RESOLUTIONS['1080p'])
+    save_template(Frame(pixels, 'RGB'), truth['buttons'][0]['position'], "slice_button", directory)
+    return TemplateLibrary(directory).load()
+
+
+def time_detector(detector, pixels, repeat):
+    """Run a detector on fresh Frames (no cached conversions); returns (output, timings in ms)"""
+    output = detector(Frame(pixels, 'RGB', window=True))
+    timings = []
+    for _ in range(repeat):
+        frame = Frame(pixels, 'RGB', window=True)
+        start = time.perf_counter()
+        detector(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    return output, timings
+
+
+def summarize(timings):
+    timings = np.array(timings)
+    mean = float(timings.mean())
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50)), 2),
+        'min_ms': round(float(timings.min()), 2),
+        'fps': round(1000 / mean, 1) if mean > 0 else None,
+    }
+
+
+def run(resolutions, repeat=5, ocr=None):
+    """Benchmark every detector; returns {'timings', 'outputs', 'ocr'}"""
+    detectors, advanced = make_detectors()
+    if ocr is None:
+        ocr = advanced.ocr_available
+    results = {'timings': {}, 'outputs': {}, 'truth': {}, 'ocr': {}, 'digits': {}, 'templates': {},
+               'layout': {'any': layout_version_checks()}}
+    reader = train_digit_reader()
+    template_dir = tempfile.TemporaryDirectory()
+    templates = make_template_library(template_dir.name)
+
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        pixels, truth = render_frame(width, height)
+        results['timings'][name] = {}
+        results['outputs'][name] = {}
+
+        for detector_name, detector in detectors.items():
+            output, timings = time_detector(detector, pixels, repeat)
+            results['outputs'][name][detector_name] = normalize(output)
+            results['timings'][name][detector_name] = summarize(timings)
+        results['truth'][name] = truth_checks(results['outputs'][name], truth)
+
+        # find_buttons_by_color has no color pre-check, so a screen without
+        # buttons must come back empty from the blob filter alone
+        blank = np.full_like(pixels, BACKGROUND)
+        for color, centers in detectors['realtime.find_buttons_by_color'](blank).items():
+            results['truth'][name][f'realtime.find_buttons_by_color.{color}.absent'] = {
+                'output': normalize(centers), 'expected': [], 'ok': not centers}
+
+        # Whole report, with OCR and tracking off so it measures the same work every run
+        ocr_state = advanced.ocr_available
+        advanced.ocr_available = False
+        _, timings = time_detector(advanced.generate_detailed_report, pixels, repeat)
+        advanced.ocr_available = ocr_state
+        results['timings'][name]['advanced.generate_detailed_report'] = summarize(timings)
+
+        # Digit reader on the layout regions, at sizes it was not taught
+        profile = select_profile(width, height)
+        gray = Frame(pixels, 'RGB').gray
+        results['digits'][name] = {}
+        for region, text in digit_texts(truth).items():
+            crop = profile.crop(gray, region)
+            output, timings = time_detector(lambda f: reader.read(crop), pixels, repeat)
+            results['timings'][name][f'digits.{region}'] = summarize(timings)
+            results['digits'][name][region] = {'output': output, 'expected': text, 'ok': output == text}
+
+        # Template matching at scales the template was not captured at
+        output, timings = time_detector(lambda f: templates.match(f, "slice_button"), pixels, repeat)
+        results['timings'][name]['templates.slice_button'] = summarize(timings)
+        expected = truth['buttons'][0]['position']
+        found = [match['position'] for match in output]
+        results['templates'][name] = {'slice_button': {
+            'output': found,
+            'expected': expected,
+            'ok': bool(found) and overlap(found[0], expected) >= 0.5,
+        }}
+
+        if ocr:
+            results['ocr'][name] = {}
+            for check_name, (detector, expected) in make_ocr_checks(width, height).items():
+                output, timings = time_detector(detector, pixels, repeat)
+                results['timings'][name][check_name] = summarize(timings)
+                results['ocr'][name][check_name] = {
+                    'output': normalize(output),
+                    'expected': expected(truth),
+                    'ok': normalize(output) == expected(truth),
+                }
+    template_dir.cleanup()
+    return results
+
+
+def compare(outputs, golden):
+    """List the detector outputs that differ from the golden ones"""
+    failures = []
+    for resolution, detectors in outputs.items():
+        for name, output in detectors.items():
+            expected = golden.get(resolution, {}).get(name)
+            if expected is None:
+                failures.append(f"{resolution} {name}: no golden output (run with --update-golden)")
+            elif output != expected:
+                failures.append(f"{resolution} {name}: got {json.dumps(output)}, expected {json.dumps(expected)}")
+    return failures
+
+
+def print_timings(timings):
+    print(f"{'resolution':<10} {'detector':<42} {'p50 ms':>8} {'min ms':>8} {'fps':>8}")
+    for resolution, detectors in timings.items():
+        for name, t in detectors.items():
+            print(f"{resolution:<10} {name:<42} {t['p50_ms']:>8.2f} {t['min_ms']:>8.2f} {t['fps']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vision detectors on synthetic frames")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS),
+                        help="Comma-separated list of " + ", ".join(RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per detector")
+    parser.add_argument("--update-golden", action="store_true", help="Save the current outputs as golden")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="Golden output file")
+    parser.add_argument("--output", help="Write timings and outputs to this JSON file")
+    parser.add_argument("--no-ocr", action="store_true", help="Skip the Tesseract checks")
+    args = parser.parse_args(argv)
+
+    resolutions = [r.strip() for r in args.resolutions.split(",") if r.strip()]
+    unknown = [r for r in resolutions if r not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"unknown resolution: {', '.join(unknown)}")
+
+    results = run(resolutions, repeat=args.repeat, ocr=False if args.no_ocr else None)
+    print_timings(results['timings'])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_golden:
+        golden = {}
+        if os.path.exists(args.golden):
+            with open(args.golden, encoding="utf-8") as f:
+                golden = json.load(f)
+        golden.update(results['outputs'])
+        os.makedirs(os.path.dirname(args.golden), exist_ok=True)
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"Golden outputs written to {args.golden}")
+        return 0
+
+    failures = []
+    if os.path.exists(args.golden):
+        with open(args.golden, encoding="utf-8") as f:
+            failures = compare(results['outputs'], json.load(f))
+    else:
+        failures.append(f"{args.golden} not found (run with --update-golden)")
+
+    checks_by_resolution = (list(results['truth'].items()) + list(results['ocr'].items())
+                            + list(results['digits'].items()) + list(results['templates'].items())
+                            + list(results['layout'].items()))
+    for resolution, checks in checks_by_resolution:
+        for name, check in checks.items():
+            gap = KNOWN_GAPS.get((resolution, name))
+            if gap and check['ok']:
+                failures.append(f"{resolution} {name}: passes now, remove it from KNOWN_GAPS")
+            elif gap:
+                print(f"KNOWN GAP {resolution} {name}: got {check['output']}, expected {check['expected']} ({gap})")
+            elif not check['ok']:
+                failures.append(f"{resolution} {name}: got {check['output']}, expected {check['expected']}")
+    if not results['ocr']:
+        print("OCR checks skipped (Tesseract not available)")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
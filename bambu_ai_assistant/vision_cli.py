@@ -0,0 +1,196 @@
+"""Headless batch analysis of screenshots, emitting JSON lines
+
+    python vision_cli.py screenshots/ --report both --workers 8 > reports.jsonl
+    find archive -name '*.png' | python vision_cli.py - --window
+    python vision_cli.py session.bfr          # frames of a recording
+
+No display is needed: images are read from disk and analyzed on a process pool.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+RECORDING_EXTENSION = '.bfr'
+
+# Per-process state, set up by init_worker
+_worker = {}
+
+
+def iter_sources(inputs, recursive=True):
+    """Yield image paths and (recording path, frame index) pairs"""
+    for name in inputs:
+        if name == '-':
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield from iter_sources([line], recursive)
+        elif os.path.isdir(name):
+            for root, dirs, files in os.walk(name):
+                dirs.sort()
+                for file in sorted(files):
+                    if file.lower().endswith(IMAGE_EXTENSIONS + (RECORDING_EXTENSION,)):
+                        yield from iter_sources([os.path.join(root, file)], recursive)
+                if not recursive:
+                    break
+        elif name.lower().endswith(RECORDING_EXTENSION):
+            from frame_recorder import Recording
+            recording = Recording(name)
+            count = len(recording)
+            recording.close()
+            for i in range(count):
+                yield (name, i)
+        else:
+            yield name
+
+
+def init_worker(report, layout, window, studio_version=None):
+    """Create the detectors once per worker process"""
+    # Each worker is already one of many processes; OCR runs inline
+    os.environ["BAMBU_OCR_WORKERS"] = "0"
+
+    from advanced_vision import AdvancedBambuVision
+    from realtime_helper import BambuVisionHelper
+    from layout_profile import load_profiles
+
+    # advanced_vision configures INFO logging on import; keep workers quiet
+    logging.getLogger().setLevel(logging.ERROR)
+
+    _worker.update(
+        report=report,
+        layout=layout,
+        window=window,
+        studio_version=studio_version,
+        profiles=load_profiles(),
+        advanced={},
+        helper={},
+        recordings={},
+        AdvancedBambuVision=AdvancedBambuVision,
+        BambuVisionHelper=BambuVisionHelper,
+    )
+
+
+def load_frame(source):
+    from frame import Frame
+
+    if isinstance(source, tuple):
+        path, index = source
+        recording = _worker['recordings'].get(path)
+        if recording is None:
+            from frame_recorder import Recording
+            recording = _worker['recordings'][path] = Recording(path)
+        return recording.frame(index)
+
+    pixels = cv2.imread(source, cv2.IMREAD_COLOR)
+    if pixels is None:
+        raise ValueError("not a readable image")
+    return Frame(pixels, 'BGR', os.path.getmtime(source), window=_worker['window'])
+
+
+def detectors_for(frame):
+    """Detectors for a frame size; layout profiles are chosen per size"""
+    profile = None
+    if _worker['layout'] or frame.window:
+        from layout_profile import select_profile
+        profile = select_profile(frame.width, frame.height, version=_worker['studio_version'],
+                                 profiles=_worker['profiles'], name=_worker['layout'])
+
+    key = (frame.width, frame.height)
+    if key not in _worker['advanced']:
+        _worker['advanced'][key] = _worker['AdvancedBambuVision'](layout_profile=profile, tracking=False)
+        _worker['helper'][key] = _worker['BambuVisionHelper'](layout_profile=profile)
+    return _worker['advanced'][key], _worker['helper'][key]
+
+
+def analyze_source(source):
+    """Analyze one image (runs in a worker process); returns (JSON line, ok)"""
+    name = f"{source[0]}#{source[1]}" if isinstance(source, tuple) else source
+    start = time.perf_counter()
+    try:
+        frame = load_frame(source)
+        advanced, helper = detectors_for(frame)
+        result = {'source': name, 'width': frame.width, 'height': frame.height}
+        if _worker['report'] in ('detailed', 'both'):
+            result['detailed'] = advanced.generate_detailed_report(frame)
+        if _worker['report'] in ('action', 'both'):
+            result['action'] = helper.generate_action_report(frame)
+        ok = True
+    except Exception as e:
+        result = {'source': name, 'error': f"{type(e).__name__}: {e}"}
+        ok = False
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return json.dumps(result, default=json_default), ok
+
+
+def json_default(value):
+    """Encode the numpy values found in reports"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def bounded_map(executor, func, items, max_pending):
+    """Like executor.map, in order, but never more than max_pending items in flight"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze Bambu Studio screenshots without a display")
+    parser.add_argument("inputs", nargs="+", help="Images, directories, .bfr recordings, or - to read paths from stdin")
+    parser.add_argument("--report", choices=("detailed", "action", "both"), default="detailed",
+                        help="generate_detailed_report, generate_action_report, or both")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--layout", default=None, help="Layout profile name for region OCR")
+    parser.add_argument("--window", action="store_true",
+                        help="Images are Bambu Studio window captures (enables layout profiles)")
+    parser.add_argument("--studio-version", default=None,
+                        help="Bambu Studio version of the captures, for version-specific layout profiles")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    parser.add_argument("--output", default="-", help="JSON lines output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    sources = iter_sources(args.inputs, recursive=not args.no_recursive)
+    start = time.monotonic()
+    count = errors = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=init_worker,
+                                 initargs=(args.report, args.layout, args.window, args.studio_version)) as executor:
+            for line, ok in bounded_map(executor, analyze_source, sources, max(1, args.workers) * 4):
+                out.write(line + "\n")
+                out.flush()
+                count += 1
+                errors += not ok
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.monotonic() - start
+    rate = count / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"Analyzed {count} images ({errors} errors) in {elapsed:.1f}s, {rate:.0f} images/min",
+          file=sys.stderr)
+    return 1 if errors and errors == count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
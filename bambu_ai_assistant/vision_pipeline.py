@@ -0,0 +1,229 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class DropOldestQueue:
+    """Bounded queue that discards its oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.condition:
+            self.items.append(item)
+            while len(self.items) > self.maxsize:
+                stale = self.items.popleft()
+                self.dropped += 1
+                if self.on_drop:
+                    # The successor inherits whatever the dropped item carried
+                    self.on_drop(stale, self.items[0])
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest item, or None on timeout or when closed"""
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.items.clear()
+            self.condition.notify_all()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+
+class FrameItem:
+    """A captured frame travelling through the pipeline"""
+
+    def __init__(self, seq, captured_at, image, meta=None):
+        self.seq = seq
+        self.captured_at = captured_at
+        self.image = image
+        self.meta = meta
+        self.result = None
+
+
+class VisionPipeline:
+    """Capture -> analysis workers -> UI publisher, linked by drop-oldest queues
+
+    capture_fn() returns (image, meta) or None to skip a tick, and raises
+    StopIteration once its source has no more frames; capturing then ends
+    while the frames already queued are still analyzed and published.
+    analyze_fn(item) returns the analysis result for a FrameItem.
+    publish_fn(item) hands a finished item to the UI; the UI should call
+    mark_displayed(item) once it is on screen.
+    scheduler, when given, decides the delay between captures instead of
+    the fixed interval.
+    merge_fn(dropped_meta, successor_meta) returns the meta a frame should
+    carry when the frame before it was dropped.
+    """
+
+    def __init__(self, capture_fn, analyze_fn, publish_fn, interval=1.0, workers=2,
+                 queue_size=2, merge_fn=None, scheduler=None):
+        self.capture_fn = capture_fn
+        self.analyze_fn = analyze_fn
+        self.publish_fn = publish_fn
+        self.interval = interval
+        self.workers = workers
+        self.merge_fn = merge_fn
+        self.scheduler = scheduler
+
+        self.frames = DropOldestQueue(queue_size, on_drop=self._merge_dropped)
+        self.results = DropOldestQueue(queue_size)
+        self.running = False
+        self.stopped = threading.Event()
+        self.generation = 0
+        self.threads = []
+        self.seq = itertools.count()
+        self.last_published = -1
+        self.stats_lock = threading.Lock()
+        self.capture_times = deque(maxlen=200)
+        self.display_times = deque(maxlen=200)
+        self.latencies = deque(maxlen=50)
+        self.stale_results = 0
+        self.started_at = time.monotonic()
+
+    def _merge_dropped(self, stale, successor):
+        if self.merge_fn:
+            successor.meta = self.merge_fn(stale.meta, successor.meta)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.stopped = threading.Event()
+        # Threads of a previous run exit once they notice the generation changed
+        self.generation += 1
+        self.started_at = time.monotonic()
+        self.frames = DropOldestQueue(self.frames.maxsize, on_drop=self._merge_dropped)
+        self.results = DropOldestQueue(self.results.maxsize)
+        self.last_published = -1
+
+        gen = self.generation
+        self.threads = [threading.Thread(target=self._capture_loop, args=(gen,), name="vision-capture", daemon=True)]
+        for i in range(self.workers):
+            self.threads.append(threading.Thread(target=self._analysis_loop, args=(gen,),
+                                                 name=f"vision-analysis-{i}", daemon=True))
+        self.threads.append(threading.Thread(target=self._publish_loop, args=(gen,), name="vision-publish", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, wait=False):
+        """Stop all threads; with wait, return only once the capture thread has exited
+
+        Waiting lets the caller close whatever capture_fn writes to (such as
+        a recording) without racing a capture in progress.
+        """
+        self.running = False
+        self.stopped.set()
+        self.frames.close()
+        self.results.close()
+        if wait and self.threads and self.threads[0] is not threading.current_thread():
+            self.threads[0].join()
+
+    def _active(self, gen):
+        return self.running and gen == self.generation
+
+    def _capture_loop(self, gen):
+        frames, stopped = self.frames, self.stopped
+        next_tick = time.monotonic()
+        while self._active(gen):
+            try:
+                captured = self.capture_fn()
+                with self.stats_lock:
+                    self.capture_times.append(time.monotonic())
+                if captured is not None:
+                    image, meta = captured
+                    frames.put(FrameItem(next(self.seq), time.monotonic(), image, meta))
+            except StopIteration:
+                logger.info("Capture source exhausted")
+                return
+            except Exception as e:
+                logger.error(f"Capture error: {e}")
+
+            # The period is the interval itself, not interval plus analysis time
+            next_tick += self.scheduler.next_interval() if self.scheduler else self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                # Woken early by stop()
+                stopped.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def _analysis_loop(self, gen):
+        frames, results = self.frames, self.results
+        while self._active(gen):
+            item = frames.get(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                item.result = self.analyze_fn(item)
+                results.put(item)
+            except Exception as e:
+                logger.error(f"Analysis error: {e}")
+
+    def _publish_loop(self, gen):
+        results = self.results
+        while self._active(gen):
+            item = results.get(timeout=0.5)
+            if item is None:
+                continue
+            # A slow worker may finish after a newer frame was already shown
+            if item.seq < self.last_published:
+                self.stale_results += 1
+                continue
+            self.last_published = item.seq
+            try:
+                self.publish_fn(item)
+            except Exception as e:
+                logger.error(f"Publish error: {e}")
+
+    def mark_displayed(self, item):
+        """Record that a published item reached the screen"""
+        now = time.monotonic()
+        with self.stats_lock:
+            self.display_times.append(now)
+            self.latencies.append(now - item.captured_at)
+
+    def stats(self, window=10.0):
+        """Achieved fps, capture-to-display latency and drop counters"""
+        now = time.monotonic()
+        span = max(1e-6, min(window, now - self.started_at))
+        with self.stats_lock:
+            captures = sum(1 for t in self.capture_times if t >= now - window)
+            displays = sum(1 for t in self.display_times if t >= now - window)
+            latencies = list(self.latencies)
+
+        return {
+            'capture_fps': captures / span,
+            'fps': displays / span,
+            'latency_ms': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'max_latency_ms': 1000 * max(latencies) if latencies else 0.0,
+            'dropped_frames': self.frames.dropped,
+            'dropped_results': self.results.dropped + self.stale_results,
+        }
+
+
+def merge_newer(cache, updates, seq):
+    """Store updates in a {key: (seq, value)} cache unless a newer frame already did"""
+    for key, value in updates.items():
+        current = cache.get(key)
+        if current is None or current[0] <= seq:
+            cache[key] = (seq, value)